@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+"""
+benchmarks.py
+
+"""
+
+import gc
+import json
+import os
+import sys
+import subprocess
+import unittest
+
+SDK_PATH = '/usr/local/google_appengine'
+
+sys.path.insert(0, SDK_PATH)
+
+import dev_appserver
+dev_appserver.fix_sys_path()
+
+from google.appengine.ext import testbed
+from google.appengine.ext import ndb
+
+from google.appengine.datastore import datastore_stub_util
+
+import ndb_faker
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+# --------------------------------------------------------------------
+# Import Benchmark
+# --------------------------------------------------------------------
+
+IMPORT_SCRIPT = """
+import sys
+import time
+
+sys.path.insert(0, %(sdk)r)
+sys.path.insert(0, %(root)r)
+
+import dev_appserver
+dev_appserver.fix_sys_path()
+
+from google.appengine.ext import ndb
+
+before = set(sys.modules)
+start = time.time()
+import ndb_faker
+elapsed = time.time() - start
+
+print elapsed
+print ' '.join(sorted(set(sys.modules) - before))
+print ' '.join(sorted(before))
+"""
+
+# modules ndb_faker must not pull in until a fake value is requested, none of which ndb loads itself
+DEFERRED_MODULES = (
+    'faker',
+    'faker.patterns',
+    'uuid',
+    'google.appengine.ext.blobstore',
+    )
+
+IMPORT_BUDGET = float(os.environ.get('NDB_FAKER_IMPORT_BUDGET', 0.05))
+IMPORT_RUNS = int(os.environ.get('NDB_FAKER_IMPORT_RUNS', 5))
+
+class ImportBenchmark(unittest.TestCase):
+
+    def measure_import(self):
+        script = IMPORT_SCRIPT % dict(sdk=SDK_PATH, root=os.path.dirname(os.path.abspath(__file__)))
+        output = subprocess.check_output([sys.executable, '-c', script])
+        elapsed, modules, baseline = output.splitlines()[-3:]
+        return float(elapsed), modules.split(), baseline.split()
+
+    def test_import_defers_heavy_modules(self):
+        elapsed, modules, baseline = self.measure_import()
+
+        for name in DEFERRED_MODULES:
+            # a module ndb already loaded would pass vacuously
+            self.assertNotIn(name, baseline)
+            self.assertNotIn(name, modules)
+
+    def test_import_time(self):
+        best = min(self.measure_import()[0] for x in xrange(IMPORT_RUNS))
+        sys.stderr.write('\nimport ndb_faker: %.2f ms (budget %.2f ms)\n' % (best * 1000, IMPORT_BUDGET * 1000))
+
+        self.assertLess(best, IMPORT_BUDGET)
+
+    # ----------------------------------------------------------------
+
+# --------------------------------------------------------------------
+# Memory Benchmark
+# --------------------------------------------------------------------
+
+# entity counts to run each mode at, e.g. NDB_FAKER_MEMORY_SCALES=1000,100000,1000000
+MEMORY_SCALES = [int(x) for x in os.environ.get('NDB_FAKER_MEMORY_SCALES', '1000,100000').split(',')]
+# peak bytes allowed per entity, including the datastore stub's copy, 0 only reports
+MEMORY_BUDGET = float(os.environ.get('NDB_FAKER_MEMORY_BUDGET', 20000))
+MEMORY_HOTSPOTS = int(os.environ.get('NDB_FAKER_MEMORY_HOTSPOTS', 10))
+
+SOURCE = os.path.join(os.path.dirname(os.path.abspath(ndb_faker.__file__)), '__init__.py')
+
+class Profile(ndb_faker.Model):
+    name = ndb_faker.StringProperty()
+    email = ndb_faker.StringProperty()
+    address = ndb_faker.StringProperty()
+    age = ndb_faker.IntegerProperty()
+    created = ndb_faker.DateTimeProperty()
+    bio = ndb_faker.TextProperty(size=256)
+    tags = ndb_faker.StringProperty(repeated=True, length=3)
+
+MEMORY_MODES = {
+    'create': lambda count: [Profile.create() for x in xrange(count)],
+    'generate': lambda count: Profile.generate(count),
+    'generate batch_size=500': lambda count: Profile.generate(count, batch_size=500),
+    'generate prototypes=10': lambda count: Profile.generate(count, batch_size=500, prototypes=10, vary=['email']),
+    'build': lambda count: Profile.build(count),
+    }
+
+def rss():
+    import resource
+    # ru_maxrss is a high-water mark in kilobytes (bytes on OS X)
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return usage if sys.platform == 'darwin' else usage * 1024
+
+def measure_memory(mode, count):
+    """ Runs one mode in a fresh testbed, returning its peak and steady-state memory and hot spots """
+    bed = testbed.Testbed()
+    bed.activate()
+    policy = datastore_stub_util.PseudoRandomHRConsistencyPolicy(probability=1)
+    bed.init_datastore_v3_stub(consistency_policy=policy, require_indexes=False)
+    bed.init_memcache_stub()
+
+    ctx = ndb.get_context()
+    ctx.set_cache_policy(False)
+    ctx.set_memcache_policy(False)
+
+    run = MEMORY_MODES[mode]
+    gc.collect()
+    try:
+        if tracemalloc is not None:
+            tracemalloc.start()
+            result = run(count)
+            peak = tracemalloc.get_traced_memory()[1]
+            snapshot = tracemalloc.take_snapshot()
+
+            # steady state is what stays allocated once the caller drops the result
+            del result
+            gc.collect()
+            steady = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+
+            stats = snapshot.filter_traces([tracemalloc.Filter(True, SOURCE)]).statistics('lineno')
+            hotspots = [(stat.traceback[0].lineno, stat.size, stat.count) for stat in stats[:MEMORY_HOTSPOTS]]
+            return dict(peak=peak, steady=steady, hotspots=hotspots, measure='peak')
+
+        # without tracemalloc only the growth of this process's high-water mark is visible
+        before = rss()
+        result = run(count)
+        return dict(peak=rss() - before, steady=None, hotspots=[], measure='peak RSS growth')
+    finally:
+        bed.deactivate()
+
+class MemoryBenchmark(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        if tracemalloc is None:
+            sys.stderr.write('\ntracemalloc is unavailable, so only peak RSS growth is reported, '
+                             'without steady state or hot spots\n')
+
+    def measure(self, mode, count):
+        # every measurement gets its own process, so neither earlier peaks nor leftovers skew it
+        output = subprocess.check_output([sys.executable, os.path.abspath(__file__), '--measure-memory',
+                                          mode, str(count)])
+        result = json.loads(output.splitlines()[-1])
+        peak, steady = result['peak'], result['steady']
+
+        sys.stderr.write('\n%s x %d: %s %.1f MB (%.0f bytes/entity), steady %s\n' % (
+            mode, count, result['measure'], peak / 1048576.0, peak / float(count),
+            'n/a' if steady is None else '%.1f MB' % (steady / 1048576.0)))
+        for lineno, size, blocks in result['hotspots']:
+            sys.stderr.write('    line %d: %.1f KB in %d blocks\n' % (lineno, size / 1024.0, blocks))
+
+        if MEMORY_BUDGET:
+            self.assertLess(peak / float(count), MEMORY_BUDGET)
+
+    def test_create_memory(self):
+        for count in MEMORY_SCALES:
+            self.measure('create', count)
+
+    def test_generate_memory(self):
+        for count in MEMORY_SCALES:
+            self.measure('generate', count)
+
+    def test_generate_batched_memory(self):
+        for count in MEMORY_SCALES:
+            self.measure('generate batch_size=500', count)
+
+    def test_generate_prototypes_memory(self):
+        for count in MEMORY_SCALES:
+            self.measure('generate prototypes=10', count)
+
+    def test_build_memory(self):
+        for count in MEMORY_SCALES:
+            self.measure('build', count)
+
+    # ----------------------------------------------------------------
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['--measure-memory']:
+        print json.dumps(measure_memory(sys.argv[2], int(sys.argv[3])))
+    else:
+        unittest.main()
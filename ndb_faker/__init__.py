@@ -12,54 +12,194 @@
 
 __version__ = '1.0'
 
+from google.appengine.api import datastore_errors
 from google.appengine.ext import ndb
-from google.appengine.api import users
+from google.appengine.runtime import apiproxy_errors
 
+import contextlib
 import datetime
-import hashlib
-import random
-import uuid
+import itertools
+import logging
+import math
+import os
+import re
+import random as _random
+import struct
+import sys
+import threading
+import time
 
-try:
-    from faker import Faker, numerify, patterns
-except ImportError:
-    raise RuntimeError(
-        'Faker module required: https://github.com/deepthawtz/faker\n\
-        This package includes the Faker module as git submodule.\n\
-        Simply swap the inner "faker" folder with the outer "faker" folder.')
+# --------------------------------------------------------------------
+# Random
+# --------------------------------------------------------------------
+
+_master_seed = None
+_streams = itertools.count()
+# bumped by every seed(), so threads holding a stream from an earlier seed derive a new one
+_generation = 0
+_local = threading.local()
+
+def _derive_seed(*parts):
+    import hashlib
+    return int(hashlib.md5(':'.join(str(part) for part in parts)).hexdigest()[:16], 16)
+
+def seed(master=None):
+    """ Sets the master seed that every thread's random stream is derived from """
+    global _master_seed, _streams, _generation
+    _master_seed = master
+    _streams = itertools.count()
+    _generation += 1
+    seed_thread(next(_streams))
+
+def seed_thread(stream):
+    """ Pins the current thread to a stream derived from the master seed """
+    _local.rng = _random.Random(_derive_seed(_master_seed, stream) if _master_seed is not None else None)
+    _local.generation = _generation
+    return _local.rng
+
+def rng():
+    if getattr(_local, 'generation', None) != _generation:
+        return seed_thread(next(_streams))
+    return _local.rng
+
+class _ThreadRandom(object):
+    """ Dispatches to the current thread's random.Random, standing in for the random module """
+
+    def __getattr__(self, name):
+        return getattr(rng(), name)
+
+# shadows the random module so every generator in this module draws from its own thread's stream
+random = _ThreadRandom()
+
+def _thread_method(name):
+    return lambda *args, **kwargs: getattr(rng(), name)(*args, **kwargs)
+
+def _patch_random(module):
+    for name, value in vars(module).items():
+        if value is _random:
+            setattr(module, name, random)
+        elif getattr(value, '__self__', None) is getattr(_random, '_inst', None):
+            setattr(module, name, _thread_method(value.__name__))
 
 # --------------------------------------------------------------------
 # Faker
 # --------------------------------------------------------------------
 
-class Faker(Faker):
-    """ Simply subclassing and adding a few more methods """
+def _load_faker():
+    try:
+        import faker
+        from faker import patterns
+    except ImportError:
+        raise RuntimeError(
+            'Faker module required: https://github.com/deepthawtz/faker\n\
+            This package includes the Faker module as git submodule.\n\
+            Simply swap the inner "faker" folder with the outer "faker" folder.')
+
+    if not getattr(faker, '_ndb_faker_patched', False):
+        for name, module in sys.modules.items():
+            if module is not None and (name == 'faker' or name.startswith('faker.')):
+                _patch_random(module)
+        faker._ndb_faker_patched = True
+    return faker
+
+class Faker(object):
+    """ Wraps the Faker module, which is only imported once a fake value is requested """
+
+    # methods of the Faker module that can be validated without importing it
+    _methods = frozenset([
+        'name', 'first_name', 'last_name', 'username', 'email', 'phonenumber',
+        'full_address', 'street_address', 'city', 'state', 'zip_code', 'company',
+        'gender', 'age', 'lorem',
+        ])
+
+    _base = None
 
-    phone_number = Faker.phonenumber
-    address      = Faker.street_address
+    @classmethod
+    def provides(cls, name):
+        if not isinstance(name, basestring):
+            return False
+        if name in cls._methods or callable(getattr(cls, name, None)):
+            return True
+        return not name.startswith('_') and hasattr(_load_faker().Faker, name)
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        if self._base is None:
+            self._base = _load_faker().Faker()
+        return getattr(self._base, name)
+
+    def phone_number(self):
+        return self.phonenumber()
+
+    def address(self):
+        return self.street_address()
 
     def zip(self):
-        return int(numerify("#####"))
+        return int(_load_faker().numerify("#####"))
 
     def ssn(self):
-        return numerify("###-##-#####")
+        return _load_faker().numerify("###-##-#####")
 
     def website(self):
-        return 'http://%s.%s' % (patterns.COMPANY_NAME().lower().replace(' ', '-'),
+        return 'http://%s.%s' % (_load_faker().patterns.COMPANY_NAME().lower().replace(' ', '-'),
                                  random.choice(['com','net','org']))
 
     def guid(self):
+        import uuid
         return str(uuid.uuid4())
 
     def md5(self):
+        import hashlib
         return hashlib.md5(str(random.random())).hexdigest()
 
     def sha1(self):
+        import hashlib
         return hashlib.sha1(str(random.random())).hexdigest()
 
     def caption(self):
         return self.lorem()[0:64]
 
+    def _text(self, size):
+        return LOREM.take(size)
+
+    def _blob(self, size=64, compressibility=0.0):
+        noise = int(round(size * (1 - compressibility)))
+        return NOISE.take(noise) + '\x00' * (size - noise)
+
+    def _document(self, size=None, depth=2, fanout=4, keys=32):
+        # every branch has `fanout` distinct keys, so string leaves are sized to spread `size` evenly
+        leaf = max(1, size // fanout ** depth - 16) if size else None
+
+        def value():
+            if leaf:
+                return LOREM.take(leaf)
+            kind = random.randint(0, 3)
+            if kind == 0:
+                return random.randint(0, 1 << 31)
+            if kind == 1:
+                return random.random()
+            if kind == 2:
+                return random.random() < 0.5
+            return LOREM.take(random.randint(4, 32))
+
+        def node(level):
+            if level == depth:
+                return value()
+            return dict(('field%d' % key, node(level + 1))
+                        for key in random.sample(xrange(keys), min(fanout, keys)))
+
+        return node(0)
+
+    def _blob_key(self, size=64):
+        from google.appengine.api import apiproxy_stub_map
+        from google.appengine.ext import blobstore
+        key = blobstore.BlobKey(self.guid())
+        stub = apiproxy_stub_map.apiproxy.GetStub('blobstore')
+        if hasattr(stub, 'CreateBlob'):
+            stub.CreateBlob(key, self._blob(size))
+        return key
+
     def latitude(self):
         geo = (random.randint(-180000000, 180000000) / 1000000.0) / 2
         return float('%0.2f' % geo)
@@ -82,6 +222,7 @@ class Faker(Faker):
             )
 
     def user(self):
+        from google.appengine.api import users
         return users.User(self.email())
 
     def chance(self):
@@ -105,6 +246,589 @@ class Faker(Faker):
     def key(self):
         return ndb.Key('Model', random.randint(1, 100000))
 
+# --------------------------------------------------------------------
+# Corpus
+# --------------------------------------------------------------------
+
+@contextlib.contextmanager
+def _replace(path):
+    """ Yields a uniquely named file beside `path`, renamed over it once written """
+    import tempfile
+    fd, temp = tempfile.mkstemp(prefix=os.path.basename(path) + '.', suffix='.tmp',
+                                dir=os.path.dirname(path) or '.')
+    try:
+        with os.fdopen(fd, 'wb') as fh:
+            yield fh
+        os.rename(temp, path)
+    except:
+        os.remove(temp)
+        raise
+
+class Corpus(object):
+    """ One large pre-generated buffer that sized values are sliced from """
+
+    def __init__(self, source, capacity, separator=' '):
+        self._source = source
+        self._capacity = capacity
+        self._separator = separator
+        self._buffer = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._buffer) if self._buffer is not None else 0
+
+    def _fill(self, capacity):
+        # filled from a fixed seed so seeded runs see the same corpus whenever it is first needed
+        state = random.getstate()
+        random.seed(capacity)
+        try:
+            chunks, filled = [], 0
+            while filled < capacity:
+                chunk = self._source()
+                chunks.append(chunk)
+                filled += len(chunk) + len(self._separator)
+            self._buffer = self._separator.join(chunks)
+        finally:
+            random.setstate(state)
+
+    def map(self, path):
+        import mmap
+        if not os.path.exists(path):
+            self.take(0)
+            with _replace(path) as fh:
+                buffer = self._buffer
+                fh.write(buffer.encode('utf-8') if isinstance(buffer, unicode) else buffer)
+
+        with open(path, 'rb') as fh:
+            self._buffer = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def take(self, size):
+        if self._buffer is None or size > len(self._buffer):
+            with self._lock:
+                if self._buffer is None or size > len(self._buffer):
+                    self._fill(max(size, self._capacity))
+        offset = random.randint(0, len(self._buffer) - size)
+        if self._separator and size:
+            offset = self._align(offset, size)
+        return self._buffer[offset:offset + size]
+
+    def _align(self, offset, size):
+        # moves a slice back to the start of a word, and back again while it would end on a separator
+        buffer, separator = self._buffer, self._separator
+        while True:
+            start = buffer.rfind(separator, 0, offset) + 1
+            if start == 0 or buffer[start + size - 1:start + size] != separator:
+                return start
+            offset = start - 1
+
+LOREM = Corpus(lambda: Faker().lorem(), 1 << 20)
+NOISE = Corpus(lambda: _random_bytes(1 << 16), 1 << 20, separator='')
+
+def _random_bytes(size):
+    return ('%0*x' % (2 * size, random.getrandbits(8 * size))).decode('hex')
+
+def _sampler(value, name):
+    if callable(value):
+        return value
+
+    try:
+        if isinstance(value, (tuple, list)):
+            low, high = [int(x) for x in value]
+        else:
+            low = high = int(value)
+    except (ValueError, TypeError):
+        raise ValueError("%s must be an integer, a (min, max) pair or a callable received %r" % (name, value))
+
+    if low < 0 or low > high:
+        raise ValueError("%s must be a non-negative integer or ordered range received %r" % (name, value))
+
+    if low == high:
+        return lambda: low
+    return lambda: random.randint(low, high)
+
+# --------------------------------------------------------------------
+# Corpus Table
+# --------------------------------------------------------------------
+
+class CorpusTable(object):
+    """ A read-only table of strings, an offsets array and a string blob, memory-mapped from a file """
+
+    MAGIC = 'NDBFAKERT1'
+    HEADER = struct.Struct('<10scI')
+    OFFSETS = struct.Struct('<II')
+
+    def __init__(self, path):
+        import mmap
+        with open(path, 'rb') as fh:
+            self._map = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, kind, self._count = self.HEADER.unpack_from(self._map, 0)
+        if magic != self.MAGIC:
+            raise ValueError("%s is not a corpus table" % path)
+
+        self._unicode = kind == 'u'
+        self._offsets = self.HEADER.size
+        self._blob = self._offsets + 4 * (self._count + 1)
+
+    def __len__(self):
+        return self._count
+
+    def __iter__(self):
+        for index in xrange(self._count):
+            yield self[index]
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in xrange(*index.indices(self._count))]
+
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError('corpus table index out of range')
+
+        start, end = self.OFFSETS.unpack_from(self._map, self._offsets + 4 * index)
+        value = self._map[self._blob + start:self._blob + end]
+        return value.decode('utf-8') if self._unicode else value
+
+    @classmethod
+    def compile(cls, path, strings):
+        kind = 'u' if any(isinstance(value, unicode) for value in strings) else 'b'
+        encoded = [value.encode('utf-8') if isinstance(value, unicode) else value for value in strings]
+
+        offsets = [0]
+        for value in encoded:
+            offsets.append(offsets[-1] + len(value))
+
+        with _replace(path) as fh:
+            fh.write(cls.HEADER.pack(cls.MAGIC, kind, len(encoded)))
+            fh.write(struct.pack('<%dI' % len(offsets), *offsets))
+            fh.write(''.join(encoded))
+        return cls(path)
+
+def _word_lists(module):
+    for name, value in vars(module).items():
+        if (name.isupper() and isinstance(value, (list, tuple)) and value
+                and all(isinstance(item, basestring) for item in value)):
+            yield name, value
+
+def use_corpora(directory):
+    """ Swaps the Faker module's word lists and the shared corpora for memory-mapped tables """
+    import hashlib
+    _load_faker()
+
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+
+    tables = {}
+    for module_name, module in sorted(sys.modules.items()):
+        if module is None or not (module_name == 'faker' or module_name.startswith('faker.')):
+            continue
+
+        for name, value in _word_lists(module):
+            if id(value) not in tables:
+                digest = hashlib.md5(repr(list(value))).hexdigest()[:12]
+                path = os.path.join(directory, '%s.%s-%s.table' % (module_name, name, digest))
+                table = CorpusTable(path) if os.path.exists(path) else CorpusTable.compile(path, value)
+                tables[id(value)] = (value, table)
+            setattr(module, name, tables[id(value)][1])
+
+    LOREM.map(os.path.join(directory, 'lorem-%d.corpus' % LOREM._capacity))
+    NOISE.map(os.path.join(directory, 'noise-%d.corpus' % NOISE._capacity))
+    return len(tables)
+
+# --------------------------------------------------------------------
+# Group Scheduler
+# --------------------------------------------------------------------
+
+def _positive(value, name):
+    try:
+        value = int(value)
+    except (ValueError, TypeError):
+        raise ValueError("%s must be an integer received %r" % (name, value))
+
+    if value < 1:
+        raise ValueError("%s must be a positive integer received %r" % (name, value))
+    return value
+
+def parent_keys(count, groups=None, per_parent=None, kind='Group', namespace=None):
+    if per_parent is not None:
+        per_parent = _positive(per_parent, 'per_parent')
+        groups = -(-count // per_parent)
+    elif groups is not None:
+        groups = _positive(groups, 'groups')
+    else:
+        return []
+
+    return [ndb.Key(kind, i + 1, namespace=namespace) for i in xrange(groups)]
+
+class GroupScheduler(object):
+    """ Interleaves writes across entity groups so none is written faster than its rate """
+
+    def __init__(self, rate=1.0):
+        self._interval = 1.0 / rate
+        self._ready = {}
+
+    @staticmethod
+    def group(entity):
+        parent = entity.key.parent() if entity.key else None
+        return parent.root() if parent else None
+
+    def batches(self, entities, size):
+        # size may be a callable, read again as each batch starts
+        batch, groups, limit = [], set(), size() if callable(size) else size
+        for entity in entities:
+            group = self.group(entity)
+            if len(batch) >= limit or (group is not None and group in groups):
+                yield batch
+                batch, groups, limit = [], set(), size() if callable(size) else size
+
+            batch.append(entity)
+            groups.add(group)
+
+        if batch:
+            yield batch
+
+    def delay(self, batch):
+        ready = max([self._ready.get(self.group(entity), 0) for entity in batch])
+        return max(0.0, ready - time.time())
+
+    def written(self, batch):
+        ready = time.time() + self._interval
+        for entity in batch:
+            group = self.group(entity)
+            if group is not None:
+                self._ready[group] = ready
+
+# --------------------------------------------------------------------
+# Key Strategy
+# --------------------------------------------------------------------
+
+ID_BITS = 52
+
+def sequential(scatter=1):
+    """ Sequential ids, interleaved across `scatter` evenly spaced ranges of the id space """
+    scatter = _positive(scatter, 'scatter')
+    span = (1 << ID_BITS) // scatter
+    return lambda index: (index % scatter) * span + index // scatter + 1
+
+def scattered():
+    """ Bit-reversed sequential ids, spread across the id space like the datastore's scattered ids """
+    return lambda index: int(bin(index + 1)[2:].zfill(ID_BITS)[::-1], 2)
+
+def hashed(prefix=4):
+    """ String ids led by a hash of their sequence number, so adjacent entities sort far apart """
+    import hashlib
+
+    prefix = _positive(prefix, 'prefix')
+    return lambda index: '%s-%d' % (hashlib.md5(str(index)).hexdigest()[:prefix], index + 1)
+
+KEY_STRATEGIES = dict(sequential=sequential, scattered=scattered, hashed=hashed)
+
+def _key_strategy(strategy):
+    if strategy is None or callable(strategy):
+        return strategy
+    if strategy not in KEY_STRATEGIES:
+        raise ValueError("key_strategy must be one of %s or a callable received %r"
+                         % (', '.join(sorted(KEY_STRATEGIES)), strategy))
+    return KEY_STRATEGIES[strategy]()
+
+# --------------------------------------------------------------------
+# Token Bucket
+# --------------------------------------------------------------------
+
+def steady(rate):
+    return lambda elapsed: rate
+
+def ramp(start, end, duration):
+    def schedule(elapsed):
+        if elapsed >= duration:
+            return end
+        return start + (end - start) * elapsed / float(duration)
+    return schedule
+
+def steps(*stages):
+    def schedule(elapsed):
+        for seconds, rate in stages:
+            if elapsed < seconds:
+                return rate
+            elapsed -= seconds
+        return stages[-1][1]
+    return schedule
+
+class TokenBucket(object):
+    """ Paces writes against a target rate, either entities/sec or a schedule of elapsed seconds """
+
+    def __init__(self, rate, burst=None):
+        if not callable(rate):
+            try:
+                rate = float(rate)
+            except (ValueError, TypeError):
+                raise ValueError("rate must be a number or a schedule received %r" % rate)
+            if rate <= 0:
+                raise ValueError("rate must be positive received %r" % rate)
+            rate = steady(rate)
+
+        self._schedule = rate
+        self._burst = burst
+        self._tokens = 0.0
+        self._budget = 0.0
+        self._start = self._last = None
+        self.count = 0
+
+    def elapsed(self):
+        return time.time() - self._start if self._start is not None else 0.0
+
+    def target(self):
+        elapsed = self.elapsed()
+        return self._budget / elapsed if elapsed else self._schedule(0)
+
+    def actual(self):
+        elapsed = self.elapsed()
+        return self.count / elapsed if elapsed else 0.0
+
+    def reserve(self, count=1):
+        now = time.time()
+        if self._start is None:
+            self._start = self._last = now
+            self._tokens = self._burst or 1.0
+
+        rate = max(self._schedule(now - self._start), 1e-6)
+        refill = (now - self._last) * rate
+        self._budget += refill
+        self._tokens = min(self._tokens + refill, self._burst or 1.0)
+        self._last = now
+
+        self._tokens -= count
+        self.count += count
+        return max(0.0, -self._tokens / rate)
+
+    def report(self):
+        return dict(count=self.count, elapsed=self.elapsed(), target=self.target(), actual=self.actual())
+
+# --------------------------------------------------------------------
+# Progress
+# --------------------------------------------------------------------
+
+class LatencyHistogram(object):
+    """ Streams latencies into log-spaced buckets so percentiles take constant memory """
+
+    def __init__(self, growth=1.1):
+        self._growth = math.log(growth)
+        self._buckets = {}
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        bucket = int(math.ceil(math.log(max(seconds, 1e-6)) / self._growth))
+        self._buckets[bucket] = self._buckets.get(bucket, 0) + 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def percentile(self, percent):
+        if not self.count:
+            return 0.0
+        rank, seen = min(self.count, int(self.count * percent / 100.0) + 1), 0
+        for bucket in sorted(self._buckets):
+            seen += self._buckets[bucket]
+            if seen >= rank:
+                return min(math.exp(bucket * self._growth), self.max)
+
+    def report(self):
+        return dict(
+            count = self.count,
+            mean = self.total / self.count if self.count else 0.0,
+            p50 = self.percentile(50),
+            p90 = self.percentile(90),
+            p99 = self.percentile(99),
+            max = self.max,
+            )
+
+class Progress(object):
+    """ Tracks entities generated and written, throughput and put latency while generate runs """
+
+    def __init__(self, total=None, interval=10.0, callback=None):
+        if callback is not None and not callable(callback):
+            raise ValueError("callback must be callable received %r" % callback)
+
+        self.total = total
+        self.budget = None
+        self.kind = 'entities'
+        self.interval = interval
+        self.callback = callback
+        self.latency = LatencyHistogram()
+        self.generated = self.written = 0
+        self._start = self._last = None
+        self._window = 0
+
+    def _begin(self):
+        if self._start is None:
+            self._start = self._last = time.time()
+
+    def elapsed(self):
+        return time.time() - self._start if self._start is not None else 0.0
+
+    def rate(self):
+        elapsed = time.time() - self._last if self._last is not None else 0.0
+        return self._window / elapsed if elapsed else 0.0
+
+    def average(self):
+        elapsed = self.elapsed()
+        return self.written / elapsed if elapsed else 0.0
+
+    def eta(self):
+        if self.total is not None:
+            average = self.average()
+            return (self.total - self.written) / average if average else None
+        if self.budget is not None and self.budget.bytes:
+            return self.elapsed() * max(0, self.budget.target - self.budget.bytes) / self.budget.bytes
+
+    def add_generated(self, count):
+        self._begin()
+        self.generated += count
+
+    def add_written(self, count, latency):
+        self._begin()
+        self.written += count
+        self._window += count
+        self.latency.add(latency)
+
+        if time.time() - self._last >= self.interval:
+            self.emit()
+
+    def report(self):
+        return dict(
+            generated = self.generated,
+            written = self.written,
+            total = self.total,
+            elapsed = self.elapsed(),
+            rate = self.rate(),
+            average = self.average(),
+            eta = self.eta(),
+            latency = self.latency.report(),
+            )
+
+    def emit(self):
+        report = self.report()
+        eta = report['eta']
+        latency = report['latency']
+        logging.info('%s: %d generated, %d/%s written, %.1f/sec (avg %.1f/sec), eta %s, '
+                     'put p50 %.0fms p90 %.0fms p99 %.0fms max %.0fms', self.kind, report['generated'],
+                     report['written'], '?' if self.total is None else self.total, report['rate'],
+                     report['average'], '?' if eta is None else '%.0fs' % eta, latency['p50'] * 1000,
+                     latency['p90'] * 1000, latency['p99'] * 1000, latency['max'] * 1000)
+
+        if self.callback is not None:
+            self.callback(report)
+
+        self._last, self._window = time.time(), 0
+        return report
+
+# --------------------------------------------------------------------
+# Adaptive Batch
+# --------------------------------------------------------------------
+
+TRANSIENT_ERRORS = (
+    datastore_errors.Timeout,
+    datastore_errors.TransactionFailedError,
+    datastore_errors.InternalError,
+    apiproxy_errors.DeadlineExceededError,
+    apiproxy_errors.OverQuotaError,
+    )
+
+class AdaptiveBatch(object):
+    """ Sizes write batches AIMD-style, growing while puts are fast and halving on slow puts or errors """
+
+    def __init__(self, size=50, minimum=1, maximum=500, latency=0.5, step=10, decrease=0.5):
+        self.minimum = _positive(minimum, 'minimum')
+        self.maximum = _positive(maximum, 'maximum')
+        self.step = _positive(step, 'step')
+        self.size = min(max(_positive(size, 'size'), self.minimum), self.maximum)
+
+        if not 0 < decrease < 1:
+            raise ValueError("decrease must be between 0 and 1 received %r" % decrease)
+        self.latency = latency
+        self.decrease = decrease
+        self.errors = 0
+
+    def __call__(self):
+        return self.size
+
+    def success(self, count, latency):
+        if latency > self.latency:
+            self.failure(error=False)
+        elif count >= self.size:
+            self.size = min(self.size + self.step, self.maximum)
+
+    def failure(self, error=True):
+        self.errors += error
+        self.size = max(int(self.size * self.decrease), self.minimum)
+
+@ndb.tasklet
+def put_batch_async(batch, retries=3, backoff=0.1, adaptive=None, progress=None):
+    """ Puts a batch, splitting and retrying the failed part with jittered backoff on transient errors """
+    if retries:
+        # retried puts rewrite the same keys rather than duplicating entities
+        _complete_keys(batch)
+
+    pending = [(batch, 0)]
+    while pending:
+        part, attempt = pending.pop(0)
+        start = time.time()
+        try:
+            yield ndb.put_multi_async(part)
+        except TRANSIENT_ERRORS, error:
+            if attempt >= retries:
+                raise
+
+            if adaptive is not None:
+                adaptive.failure()
+            logging.warning('Retrying %d entities after %s (attempt %d of %d)',
+                            len(part), type(error).__name__, attempt + 1, retries)
+
+            # jitter comes from the shared stdlib generator so retries don't shift seeded streams
+            yield ndb.sleep(_random.uniform(0, backoff * 2 ** attempt))
+            middle = (len(part) + 1) // 2
+            pending[:0] = [(half, attempt + 1) for half in (part[:middle], part[middle:]) if half]
+            continue
+
+        latency = time.time() - start
+        if adaptive is not None:
+            adaptive.success(len(part), latency)
+        if progress is not None:
+            progress.add_written(len(part), latency)
+
+# --------------------------------------------------------------------
+# Prototypes
+# --------------------------------------------------------------------
+
+class Prototypes(object):
+    """ Fills entities from a few fully generated templates, regenerating only the varying properties """
+
+    def __init__(self, model, count=10, vary=()):
+        names = [getattr(prop, '_name', prop) for prop in vary]
+        for name in names:
+            if name not in model._properties:
+                raise ValueError("vary must name properties of %s received %r" % (model._get_kind(), vary))
+
+        self.vary = frozenset(names)
+        self.names = [prop._name for prop in model._properties.itervalues()
+                      if isinstance(prop, Property) and prop._name not in self.vary]
+        self.templates = model._build(_positive(count, 'prototypes'))
+        for template in self.templates:
+            template._prepare_for_put()
+
+    def apply(self, entities, offset=0):
+        count = len(self.templates)
+        for i, entity in enumerate(entities):
+            # values are shared with the template, only lists are copied
+            values = self.templates[(offset + i) % count]._values
+            for name in self.names:
+                value = values.get(name)
+                if value is not None:
+                    entity._values[name] = list(value) if isinstance(value, list) else value
+
 # --------------------------------------------------------------------
 # Model
 # --------------------------------------------------------------------
@@ -122,9 +846,997 @@ class Model(ndb.Model):
         return entity
 
     @classmethod
-    def generate(cls, count):
-        generator = (cls.create() for i in xrange(count))
-        return [entity for entity in generator]
+    def _prepare_batch(cls, entities):
+        for prop in cls._properties.itervalues():
+            if isinstance(prop, Property) and (prop._repeated or prop._batched):
+                prop._prepare_batch(entities)
+
+    @classmethod
+    def reset_variants(cls):
+        for prop in cls._properties.itervalues():
+            if isinstance(prop, PayloadProperty):
+                prop._reset_variants()
+
+    @classmethod
+    def _build(cls, count, parents=None, offset=None, key_strategy=None, namespace=None, prototypes=None, built=0):
+        # built carries ids, parents and templates on from the chunks already built
+        start = (offset or 0) + built
+        if key_strategy is None and offset is not None:
+            key_strategy = sequential()
+        entities = [cls(id=key_strategy(start + i) if key_strategy else None,
+                        parent=parents[(start + i) % len(parents)] if parents else None,
+                        namespace=namespace)
+                    for i in xrange(count)]
+        if prototypes is not None:
+            prototypes.apply(entities, start)
+        cls._prepare_batch(entities)
+        return entities
+
+    @classmethod
+    def build(cls, count, groups=None, per_parent=None, parent_kind='Group', offset=None, key_strategy=None,
+              run_id=None, prototypes=None, vary=()):
+        namespace = run_namespace(run_id)
+        cls.reset_variants()
+        if prototypes is not None and not isinstance(prototypes, Prototypes):
+            prototypes = Prototypes(cls, prototypes, vary)
+        entities = cls._build(count, parent_keys(count, groups, per_parent, parent_kind, namespace), offset,
+                              _key_strategy(key_strategy), namespace, prototypes)
+        for entity in entities:
+            entity._prepare_for_put()
+        return entities
+
+    @classmethod
+    def preload(cls, count, stub=None, write=False, **options):
+        return preload(cls.build(count, **options), stub, write)
+
+    @classmethod
+    def _build_stream(cls, count, budget, parents, offset, chunk, key_strategy=None, namespace=None,
+                      prototypes=None):
+        # builds one chunk at a time, so no more than a write batch is held before it is put
+        built = 0
+        while (count is None or built < count) and (budget is None or not budget.reached()):
+            size = chunk if count is None else min(chunk, count - built)
+            for entity in cls._build(size, parents, offset, key_strategy, namespace, prototypes, built):
+                built += 1
+                if budget is not None:
+                    entity._prepare_for_put()
+                    budget.add(entity)
+                yield entity
+
+                if budget is not None and budget.reached():
+                    return
+
+    @classmethod
+    def generate(cls, count=None, **options):
+        return cls.generate_async(count, **options).get_result()
+
+    @classmethod
+    def fan_out(cls, count, **options):
+        return fan_out(cls, count, **options)
+
+    @classmethod
+    def purge(cls, run_id, **options):
+        return purge(run_id, cls, **options)
+
+    @classmethod
+    def estimate(cls, indexes=None, samples=10):
+        return estimate(cls, indexes, samples)
+
+    @classmethod
+    def unindex(cls, keep=(), indexes=None):
+        return unindex(cls, keep, indexes)
+
+    @classmethod
+    @ndb.tasklet
+    def generate_async(cls, count=None, batch_size=None, groups=None, per_parent=None,
+                       parent_kind='Group', group_rate=1.0, rate=None, offset=None, warm_cache=False,
+                       stats=None, target_bytes=None, progress=None, retries=0, backoff=0.1,
+                       key_strategy=None, run_id=None, prototypes=None, vary=()):
+        if (count is None) == (target_bytes is None):
+            raise ValueError("generate needs either a count or target_bytes")
+        if target_bytes is not None and per_parent is not None:
+            raise ValueError("per_parent cannot be combined with target_bytes")
+
+        namespace = run_namespace(run_id)
+        parents = parent_keys(count or 0, groups, per_parent, parent_kind, namespace)
+        cls.reset_variants()
+        if prototypes is not None and not isinstance(prototypes, Prototypes):
+            prototypes = Prototypes(cls, prototypes, vary)
+
+        if parents and count is not None and count > len(parents):
+            logging.warning('Writing %d %s entities into %d entity groups at %.2f writes/sec per group '
+                            'will take at least %.0f seconds', count, cls._get_kind(), len(parents),
+                            group_rate, (-(-count // len(parents)) - 1) / float(group_rate))
+
+        key_strategy = _key_strategy(key_strategy)
+        if batch_size == 'adaptive':
+            batch_size = AdaptiveBatch()
+        adaptive = batch_size if isinstance(batch_size, AdaptiveBatch) else None
+        size = batch_size or (500 if parents else 1)
+        budget = None
+        if target_bytes is not None:
+            budget = target_bytes if isinstance(target_bytes, ByteBudget) else ByteBudget(target_bytes)
+        stream = cls._build_stream(count, budget, parents, offset, adaptive.maximum if adaptive else max(size, 100),
+                                   key_strategy, namespace, prototypes)
+
+        scheduler = GroupScheduler(group_rate)
+        bucket = rate if isinstance(rate, TokenBucket) or rate is None else TokenBucket(rate)
+
+        if progress is not None and not isinstance(progress, Progress):
+            progress = Progress(callback=progress) if callable(progress) else Progress()
+        if progress is not None:
+            if progress.total is None:
+                progress.total = count
+            progress.budget = budget
+            progress.kind = cls._get_kind()
+
+        entities = []
+        for batch in scheduler.batches(stream, size):
+            if progress is not None:
+                for entity in batch:
+                    entity._prepare_for_put()
+                progress.add_generated(len(batch))
+
+            delay = scheduler.delay(batch)
+            if bucket is not None:
+                delay = max(delay, bucket.reserve(len(batch)))
+            if delay:
+                yield ndb.sleep(delay)
+
+            yield put_batch_async(batch, retries, backoff, adaptive, progress)
+
+            scheduler.written(batch)
+            entities.extend(batch)
+
+            if stats is not None:
+                stats.record(batch)
+
+            if warm_cache:
+                populate_caches(batch, memcache=warm_cache != 'context', context=warm_cache != 'memcache')
+
+        if bucket is not None:
+            logging.info('Generated %d %s entities at %.1f/sec (target %.1f/sec)',
+                         len(entities), cls._get_kind(), bucket.actual(), bucket.target())
+
+        if budget is not None:
+            report = budget.report()
+            logging.info('Generated %d %s entities, %d bytes (%.0f bytes/entity) plus an estimated '
+                         '%.0f index bytes/entity', report['count'], cls._get_kind(), report['bytes'],
+                         report['bytes_per_entity'], report['index_bytes_per_entity'])
+
+        if progress is not None:
+            progress.emit()
+
+        raise ndb.Return(entities)
+
+    @classmethod
+    def _fake_properties(cls, properties=None):
+        if properties is None:
+            return [prop for prop in cls._properties.itervalues() if isinstance(prop, Property)]
+
+        props = []
+        for prop in properties:
+            prop = cls._properties.get(getattr(prop, '_name', prop))
+            if not isinstance(prop, Property):
+                raise ValueError("properties must name fake properties of %s received %r"
+                                 % (cls._get_kind(), properties))
+            props.append(prop)
+        return props
+
+    @classmethod
+    def mutate(cls, query_or_keys=None, **options):
+        return cls.mutate_async(query_or_keys, **options).get_result()
+
+    @classmethod
+    @ndb.tasklet
+    def mutate_async(cls, query_or_keys=None, fraction=1.0, properties=None, batch_size=500,
+                     progress=None, retries=0, backoff=0.1):
+        """ Regenerates each chosen fake property of existing entities with probability `fraction` """
+        props = cls._fake_properties(properties)
+        try:
+            fraction = float(fraction)
+        except (ValueError, TypeError):
+            raise ValueError("fraction must be a number received %r" % fraction)
+        if not 0 < fraction <= 1:
+            raise ValueError("fraction must be between 0 and 1 received %r" % fraction)
+        batch_size = _positive(batch_size, 'batch_size')
+        cls.reset_variants()
+
+        if progress is not None and not isinstance(progress, Progress):
+            progress = Progress(callback=progress) if callable(progress) else Progress()
+        if progress is not None:
+            progress.kind = cls._get_kind()
+
+        def mutate_batch(batch):
+            changed = []
+            for entity in batch:
+                if entity is None:
+                    continue
+                mutated = [prop for prop in props if random.random() < fraction]
+                for prop in mutated:
+                    prop._store_value(entity, prop._generate(entity))
+                if mutated:
+                    changed.append(entity)
+
+            if progress is not None:
+                progress.add_generated(len(changed))
+            return put_batch_async(changed, retries, backoff, progress=progress), len(changed)
+
+        def pages():
+            if query_or_keys is None or isinstance(query_or_keys, ndb.Query):
+                query = cls.query() if query_or_keys is None else query_or_keys
+                cursor, more = None, True
+                while more:
+                    page = query.fetch_page_async(batch_size, start_cursor=cursor)
+                    yield page
+                    batch, cursor, more = page.get_result()
+            else:
+                keys = list(query_or_keys)
+                for start in xrange(0, len(keys), batch_size):
+                    yield ndb.get_multi_async(keys[start:start + batch_size])
+
+        # each batch is written while the next one is read
+        writes, count = [], 0
+        for page in pages():
+            batch = yield page
+            writes.append(mutate_batch(batch[0] if isinstance(batch, tuple) else batch))
+            if len(writes) > 1:
+                write, changed = writes.pop(0)
+                yield write
+                count += changed
+
+        for write, changed in writes:
+            yield write
+            count += changed
+
+        if progress is not None:
+            progress.emit()
+
+        raise ndb.Return(count)
+
+# --------------------------------------------------------------------
+# Generation Job
+# --------------------------------------------------------------------
+
+class GenerationCheckpoint(ndb.Model):
+
+    chunk = ndb.IntegerProperty(indexed=False)
+    updated = ndb.DateTimeProperty(auto_now=True, indexed=False)
+
+    @classmethod
+    def _get_kind(cls):
+        return 'NdbFakerCheckpoint'
+
+class DatastoreCheckpoint(object):
+    """ Persists the number of completed chunks as a marker entity """
+
+    def __init__(self, name):
+        self.key = ndb.Key(GenerationCheckpoint, name)
+
+    def load(self):
+        marker = self.key.get(use_cache=False, use_memcache=False)
+        return marker.chunk if marker else 0
+
+    def save(self, chunk):
+        GenerationCheckpoint(key=self.key, chunk=chunk).put(use_cache=False, use_memcache=False)
+
+    def clear(self):
+        self.key.delete(use_cache=False, use_memcache=False)
+
+class LocalCheckpoint(object):
+    """ Persists the number of completed chunks in a local file """
+
+    def __init__(self, path):
+        self.path = path
+
+    def load(self):
+        try:
+            with open(self.path) as fh:
+                return int(fh.read().strip() or 0)
+        except IOError:
+            return 0
+
+    def save(self, chunk):
+        with _replace(self.path) as fh:
+            fh.write('%d\n' % chunk)
+
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+class GenerationJob(object):
+    """ Generates a dataset in fixed-size seeded chunks, checkpointing after each one """
+
+    def __init__(self, model, count, chunk_size=1000, seed=0, checkpoint=None, name=None,
+                 chunk_range=None, **options):
+        self.model = model
+        self.count = count
+        self.chunk_size = _positive(chunk_size, 'chunk_size')
+        self.seed = seed
+        self.first, self.last = chunk_range or (0, self.chunks)
+        # options that change the data, such as run_id or key_strategy, give the job its own checkpoint
+        self.name = name or '%s-%d-%d-%s-%s' % (model._get_kind(), count, self.chunk_size, seed,
+                                                FixtureCache.key(model, count, seed, **options)[:12])
+        if chunk_range:
+            self.name = '%s-%d-%d' % (self.name, self.first, self.last)
+        self.checkpoint = checkpoint or DatastoreCheckpoint(self.name)
+
+        # children are spread over the groups of the whole dataset, not of each chunk
+        if options.get('per_parent') is not None:
+            options['groups'] = -(-count // _positive(options.pop('per_parent'), 'per_parent'))
+        self.options = options
+
+    @property
+    def chunks(self):
+        return -(-self.count // self.chunk_size)
+
+    def run_chunk(self, chunk):
+        start = chunk * self.chunk_size
+        stop = min(start + self.chunk_size, self.count)
+
+        state = random.getstate()
+        random.seed(_derive_seed(self.seed, chunk))
+        try:
+            return self.model.generate(stop - start, offset=start, **self.options)
+        finally:
+            random.setstate(state)
+
+    def shards(self, count):
+        chunks = self.last - self.first
+        count = min(_positive(count, 'shards'), chunks) or 1
+        bounds = [self.first + chunks * i // count for i in xrange(count + 1)]
+        return zip(bounds[:-1], bounds[1:])
+
+    def run(self, deadline=None):
+        started = time.time()
+        chunk = max(self.checkpoint.load(), self.first)
+
+        while chunk < self.last:
+            self.run_chunk(chunk)
+            chunk += 1
+            self.checkpoint.save(chunk)
+            logging.info('%s: completed chunk %d of %d', self.name, chunk, self.last)
+
+            if deadline is not None and time.time() - started >= deadline:
+                break
+
+        return chunk >= self.last
+
+# --------------------------------------------------------------------
+# Fan Out
+# --------------------------------------------------------------------
+
+def _task_name(name):
+    return re.sub(r'[^a-zA-Z0-9_-]', '-', name)[:500]
+
+def _run_shard(kind, count, chunk_size, seed, chunk_range, queue_name, deadline, options):
+    from google.appengine.ext import deferred
+
+    model = ndb.Model._lookup_model(kind)
+    job = GenerationJob(model, count, chunk_size, seed, chunk_range=chunk_range, **options)
+    if not job.run(deadline=deadline):
+        deferred.defer(_run_shard, kind, count, chunk_size, seed, chunk_range, queue_name, deadline, options,
+                       _queue=queue_name)
+
+def fan_out(model, count, shards=10, chunk_size=1000, seed=0, queue_name='default', deadline=480, **options):
+    from google.appengine.api import taskqueue
+    from google.appengine.ext import deferred
+
+    job = GenerationJob(model, count, chunk_size, seed, **options)
+    ranges = job.shards(shards)
+
+    for chunk_range in ranges:
+        try:
+            deferred.defer(_run_shard, model._get_kind(), count, chunk_size, seed, chunk_range,
+                           queue_name, deadline, options, _queue=queue_name,
+                           _name=_task_name('%s-%d-%d' % ((job.name,) + chunk_range)))
+        except (taskqueue.TaskAlreadyExistsError, taskqueue.TombstonedTaskError):
+            logging.warning('%s: shard %r was already enqueued and is skipped, pass a new name to '
+                            'generate it again', job.name, chunk_range)
+
+    return ranges
+
+# --------------------------------------------------------------------
+# Purge
+# --------------------------------------------------------------------
+
+RUN_NAMESPACE = 'ndb_faker.%s'
+
+def run_namespace(run_id):
+    """ The namespace entities generated under `run_id` are written to """
+    if run_id is None:
+        return None
+    if not re.match(r'^[0-9A-Za-z._-]{1,90}$', str(run_id)):
+        raise ValueError("run_id must be up to 90 letters, digits, '.', '_' or '-' received %r" % run_id)
+    return RUN_NAMESPACE % run_id
+
+@ndb.tasklet
+def purge_async(run_id, model=None, batch_size=500, parallel=4, progress=None):
+    """ Deletes the entities generated under `run_id`, of one model or of every kind """
+    namespace = run_namespace(run_id)
+    if namespace is None:
+        raise ValueError("run_id is required to purge")
+    batch_size = _positive(batch_size, 'batch_size')
+    parallel = _positive(parallel, 'parallel')
+
+    if progress is not None and not isinstance(progress, Progress):
+        progress = Progress(callback=progress) if callable(progress) else Progress()
+    if progress is not None:
+        progress.kind = 'Purge %s' % namespace
+
+    @ndb.tasklet
+    def delete(keys):
+        start = time.time()
+        yield ndb.delete_multi_async(keys)
+        if progress is not None:
+            progress.add_written(len(keys), time.time() - start)
+
+    query = model.query(namespace=namespace) if model is not None else ndb.Query(namespace=namespace)
+    deletes, count, cursor, more = [], 0, None, True
+    while more:
+        keys, cursor, more = yield query.fetch_page_async(batch_size, start_cursor=cursor, keys_only=True)
+        keys = [key for key in keys if not key.kind().startswith('__')]
+        if progress is not None:
+            progress.add_generated(len(keys))
+
+        deletes.append(delete(keys))
+        count += len(keys)
+        if len(deletes) >= parallel:
+            yield deletes.pop(0)
+
+    yield deletes
+    if progress is not None:
+        progress.emit()
+
+    raise ndb.Return(count)
+
+def purge(run_id, model=None, **options):
+    return purge_async(run_id, model, **options).get_result()
+
+# --------------------------------------------------------------------
+# Index Estimate
+# --------------------------------------------------------------------
+
+def composite_indexes(model, indexes):
+    """ Returns the property names of each composite index of a model, from tuples or an index.yaml path """
+    if indexes is None:
+        return []
+
+    if isinstance(indexes, basestring):
+        from google.appengine.datastore import datastore_index
+        with open(indexes) as fh:
+            definitions = datastore_index.ParseIndexDefinitions(fh)
+        indexes = definitions.indexes if definitions and definitions.indexes else []
+
+    result = []
+    for index in indexes:
+        if hasattr(index, 'properties'):
+            if index.kind == model._get_kind():
+                result.append(tuple(prop.name for prop in index.properties or []))
+        else:
+            result.append(tuple(index))
+    return result
+
+def estimate(model, indexes=None, samples=10):
+    """ Estimates the datastore writes and stored bytes of putting one new entity of a model """
+    composites = composite_indexes(model, indexes)
+    samples = _positive(samples, 'samples')
+
+    properties = {}
+    key_bytes = entity_bytes = 0
+    for i in xrange(samples):
+        entity = model(id=i + 1)
+        entity._prepare_for_put()
+        pb = entity._to_pb()
+        key_bytes += pb.key().ByteSize()
+        entity_bytes += pb.ByteSize()
+
+        for indexed, props in ((True, pb.property_list()), (False, pb.raw_property_list())):
+            for prop in props:
+                stats = properties.setdefault(prop.name(), dict(indexed=indexed, values=0, bytes=0))
+                stats['values'] += 1
+                stats['bytes'] += prop.ByteSize()
+
+    key_bytes /= float(samples)
+    for stats in properties.itervalues():
+        stats['value_bytes'] = stats['bytes'] / float(stats['values']) if stats['values'] else 0.0
+        stats['values'] /= float(samples)
+        stats['bytes'] /= float(samples)
+
+        # one ascending and one descending row in the built-in indexes per indexed value
+        stats['index_writes'] = 2 * stats['values'] if stats['indexed'] else 0.0
+        stats['index_bytes'] = stats['index_writes'] * (key_bytes + stats['value_bytes'])
+
+    composite_writes = composite_bytes = 0.0
+    for names in composites:
+        rows, value_bytes = 1.0, key_bytes
+        for name in names:
+            stats = properties.get(name, dict(values=0.0, value_bytes=0.0))
+            rows *= stats['values']
+            value_bytes += stats['value_bytes']
+        composite_writes += rows
+        composite_bytes += rows * value_bytes
+
+    index_writes = sum(stats['index_writes'] for stats in properties.itervalues()) + composite_writes
+    return dict(
+        kind = model._get_kind(),
+        entity_bytes = entity_bytes / float(samples),
+        index_writes = index_writes,
+        index_bytes = sum(stats['index_bytes'] for stats in properties.itervalues()) + composite_bytes,
+        composite_writes = composite_writes,
+        writes = 2 + index_writes,
+        properties = properties,
+        )
+
+def unindex(model, keep=(), indexes=None):
+    """ Turns off indexing on the fake properties of a model that are neither kept nor in a composite index """
+    keep = set(keep)
+    for names in composite_indexes(model, indexes):
+        keep.update(names)
+
+    unindexed = []
+    for name, prop in sorted(model._properties.iteritems()):
+        if isinstance(prop, Property) and prop._indexed and name not in keep:
+            prop._indexed = False
+            unindexed.append(name)
+    return unindexed
+
+# --------------------------------------------------------------------
+# Byte Budget
+# --------------------------------------------------------------------
+
+def _value_bytes(value):
+    if isinstance(value, ndb.model._BaseValue):
+        value = value.b_val
+    if isinstance(value, unicode):
+        return len(value.encode('utf-8'))
+    if isinstance(value, str):
+        return len(value)
+    if isinstance(value, bool):
+        return 1
+    if isinstance(value, (int, long, float, datetime.date, datetime.time)):
+        return 8
+    if isinstance(value, ndb.GeoPt):
+        return 18
+    if isinstance(value, ndb.Key):
+        return _key_bytes(value)
+    if isinstance(value, ndb.Model):
+        return _entity_bytes(value)
+    if isinstance(value, (list, tuple)):
+        return sum(_value_bytes(item) + 1 for item in value) + 2
+    if isinstance(value, dict):
+        return sum(_value_bytes(unicode(key)) + _value_bytes(item) + 4 for key, item in value.iteritems()) + 2
+    if hasattr(value, 'email'):
+        return _value_bytes(value.email()) + 16
+    return len(repr(value))
+
+def _key_bytes(key):
+    return sum(len(kind) + 10 for kind, id in key.pairs()) + len(key.app()) + len(key.namespace() or '') + 4
+
+def _stored_value(prop, entity):
+    # reads values as stored, so pre-serialised variants are measured without being decoded
+    if isinstance(prop, ndb.ComputedProperty):
+        return prop._get_value(entity)
+    return prop._retrieve_value(entity, prop._default)
+
+def _entity_bytes(entity):
+    """ Estimates an entity's serialised protobuf size from its values, without serialising it """
+    size = (_key_bytes(entity.key) if entity.key else 0) + 16
+    for prop in entity._properties.itervalues():
+        value = _stored_value(prop, entity)
+        if value is None:
+            continue
+        overhead = len(prop._name) + 8
+        for item in (value if prop._repeated else [value]):
+            size += overhead + _value_bytes(item)
+    return size
+
+def _index_bytes(entity):
+    """ Estimates the built-in index rows an entity writes, as estimate() counts them, from its values """
+    key = _key_bytes(entity.key) if entity.key else 0
+    size = 0
+    for prop in entity._properties.itervalues():
+        if not prop._indexed or isinstance(prop, ndb.StructuredProperty):
+            continue
+        value = _stored_value(prop, entity)
+        if value is None:
+            continue
+        overhead = key + len(prop._name) + 8
+        for item in (value if prop._repeated else [value]):
+            # one ascending and one descending row per indexed value
+            size += 2 * (overhead + _value_bytes(item))
+    return size
+
+class ByteBudget(object):
+    """ Tracks the estimated serialised size of generated entities against a target in bytes """
+
+    def __init__(self, target):
+        self.target = _positive(target, 'target_bytes')
+        self.bytes = 0
+        self.index_bytes = 0
+        self.count = 0
+
+    def add(self, entity):
+        self.bytes += _entity_bytes(entity)
+        self.index_bytes += _index_bytes(entity)
+        self.count += 1
+
+    def reached(self):
+        return self.bytes >= self.target
+
+    def report(self):
+        count = float(self.count or 1)
+        return dict(
+            target = self.target,
+            bytes = self.bytes,
+            count = self.count,
+            bytes_per_entity = self.bytes / count,
+            index_bytes_per_entity = self.index_bytes / count,
+            index_bytes = self.index_bytes,
+            )
+
+# --------------------------------------------------------------------
+# Cache Warming
+# --------------------------------------------------------------------
+
+def populate_caches(entities, memcache=True, context=True):
+    """ Writes entities into the NDB context cache and into memcache using NDB's own key format """
+    ctx = ndb.get_context()
+
+    if context:
+        for entity in entities:
+            ctx._cache[entity.key] = entity
+
+    if memcache:
+        from google.appengine.api import memcache as api
+
+        mappings = {}
+        for entity in entities:
+            key = entity.key
+            pbs = entity._to_pb(set_key=False).SerializePartialToString()
+            if len(pbs) <= api.MAX_VALUE_SIZE:
+                group = (key.namespace(), ctx._get_memcache_timeout(key))
+                mappings.setdefault(group, {})[ctx._memcache_prefix + key.urlsafe()] = pbs
+
+        client = api.Client()
+        for (namespace, timeout), mapping in mappings.iteritems():
+            client.set_multi(mapping, time=timeout or 0, namespace=namespace)
+
+    return entities
+
+# --------------------------------------------------------------------
+# Query Workload
+# --------------------------------------------------------------------
+
+def _beyond(value):
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, long, float)):
+        return value + 1
+    if isinstance(value, basestring):
+        return value + '~'
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value + datetime.timedelta(days=1)
+    return None
+
+def _percentile(values, percent):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * percent / 100.0))]
+
+class ValueStats(object):
+    """ Samples the indexed property values of generated entities, along with their ranges """
+
+    def __init__(self, model, size=1000):
+        self.model = model
+        self.size = size
+        self.count = 0
+        self.samples = []
+        self.ranges = {}
+        self.names = [name for name, prop in sorted(model._properties.iteritems())
+                      if prop._indexed and not isinstance(prop, ndb.StructuredProperty)]
+        # sampling has its own generator so recording stats doesn't shift the seeded data streams
+        self._random = _random.Random()
+
+    def record(self, entities):
+        for entity in entities:
+            values = {}
+            for name in self.names:
+                prop = self.model._properties[name]
+                value = prop._get_value(entity)
+                values[name] = [v for v in (value if prop._repeated else [value]) if v is not None]
+
+                for v in values[name]:
+                    bounds = self.ranges.get(name)
+                    try:
+                        self.ranges[name] = [min(bounds[0], v), max(bounds[1], v)] if bounds else [v, v]
+                    except TypeError:
+                        pass
+
+            self.count += 1
+            if len(self.samples) < self.size:
+                self.samples.append(values)
+            else:
+                index = self._random.randint(0, self.count - 1)
+                if index < self.size:
+                    self.samples[index] = values
+
+    def values(self, name):
+        return [value for sample in self.samples for value in sample.get(name, [])]
+
+    def cardinality(self, name):
+        return len(set(self.values(name)))
+
+    def frequency(self, name, value):
+        if not self.samples:
+            return 0.0
+        return sum(1 for sample in self.samples if value in sample.get(name, [])) / float(len(self.samples))
+
+class QueryWorkload(object):
+    """ Emits equality, range, IN and composite queries drawn from recorded value statistics """
+
+    KINDS = ('equality', 'range', 'in', 'composite')
+
+    def __init__(self, stats, hit_rate=1.0, selectivity=0.01, in_size=3, mix=None):
+        self.stats = stats
+        self.hit_rate = hit_rate
+        self.selectivity = selectivity
+        self.in_size = in_size
+        self.mix = mix or dict((kind, 1.0) for kind in self.KINDS)
+
+    def _prop(self, name):
+        return self.stats.model._properties[name]
+
+    def _names(self, orderable=False):
+        names = [name for name in self.stats.names if self.stats.values(name)]
+        if orderable:
+            names = [name for name in names
+                     if name in self.stats.ranges and _beyond(self.stats.ranges[name][1]) is not None]
+        return names
+
+    def _miss(self, name):
+        bounds = self.stats.ranges.get(name)
+        return _beyond(bounds[1]) if bounds else None
+
+    def equality(self, hit):
+        names = self._names(orderable=not hit)
+        if not names:
+            return None
+        name = random.choice(names)
+        value = random.choice(self.stats.values(name)) if hit else self._miss(name)
+        return self.stats.model.query(self._prop(name) == value)
+
+    def range(self, hit):
+        names = self._names(orderable=True)
+        if not names:
+            return None
+        name = random.choice(names)
+        prop = self._prop(name)
+        if not hit:
+            return self.stats.model.query(prop > self.stats.ranges[name][1])
+
+        values = sorted(self.stats.values(name))
+        width = max(1, int(len(values) * self.selectivity))
+        start = random.randint(0, len(values) - width)
+        return self.stats.model.query(prop >= values[start], prop <= values[start + width - 1])
+
+    def in_(self, hit):
+        names = self._names(orderable=not hit)
+        if not names:
+            return None
+        name = random.choice(names)
+        if hit:
+            values = list(set(self.stats.values(name)))
+            values = random.sample(values, min(self.in_size, len(values)))
+        else:
+            values = [self._miss(name)]
+            while len(values) < self.in_size:
+                values.append(_beyond(values[-1]))
+        return self.stats.model.query(self._prop(name).IN(values))
+
+    def composite(self, hit):
+        sample = random.choice(self.stats.samples) if self.stats.samples else {}
+        names = [name for name in self._names() if sample.get(name)]
+        misses = [name for name in self._names(orderable=True) if sample.get(name)]
+        if len(names) < 2 or (not hit and not misses):
+            return None
+
+        second = random.choice(names if hit else misses)
+        first = random.choice([name for name in names if name != second])
+        value = random.choice(sample[second]) if hit else self._miss(second)
+        return self.stats.model.query(self._prop(first) == random.choice(sample[first]),
+                                      self._prop(second) == value)
+
+    def queries(self, count):
+        kinds = [kind for kind in self.KINDS if self.mix.get(kind)]
+        total = sum(self.mix[kind] for kind in kinds)
+
+        emitted = 0
+        while emitted < count:
+            pick, kind = random.uniform(0, total), kinds[-1]
+            for candidate in kinds:
+                pick -= self.mix[candidate]
+                if pick <= 0:
+                    kind = candidate
+                    break
+
+            hit = random.random() < self.hit_rate
+            query = getattr(self, 'in_' if kind == 'in' else kind)(hit)
+            if query is not None:
+                emitted += 1
+                yield kind, query, hit
+
+def run_queries(queries, limit=20, keys_only=False):
+    """ Runs (kind, query, expected hit) items, reporting latency percentiles and hit rates """
+    latencies, kinds, hits, expected = [], {}, 0, 0
+    for kind, query, hit in queries:
+        start = time.time()
+        results = query.fetch(limit, keys_only=keys_only)
+        latency = time.time() - start
+
+        latencies.append(latency)
+        kinds.setdefault(kind, []).append(latency)
+        hits += bool(results)
+        expected += bool(hit)
+
+    count = len(latencies)
+    report = lambda values: dict(
+        count = len(values),
+        p50 = _percentile(values, 50),
+        p90 = _percentile(values, 90),
+        p99 = _percentile(values, 99),
+        max = max(values) if values else 0.0,
+        )
+
+    result = report(latencies)
+    result.update(
+        hit_rate = hits / float(count) if count else 0.0,
+        expected_hit_rate = expected / float(count) if count else 0.0,
+        kinds = dict((kind, report(values)) for kind, values in kinds.iteritems()),
+        )
+    return result
+
+# --------------------------------------------------------------------
+# Preload
+# --------------------------------------------------------------------
+
+def _complete_keys(entities):
+    pending = {}
+    for entity in entities:
+        if entity.key is None or entity.key.id() is None:
+            pending.setdefault(type(entity), []).append(entity)
+
+    # one allocation RPC per model rather than one put RPC per entity
+    for model, group in pending.iteritems():
+        first, last = model.allocate_ids(size=len(group))
+        for id, entity in zip(xrange(first, last + 1), group):
+            if entity.key is None:
+                entity.key = ndb.Key(model, id)
+            else:
+                key = entity.key
+                entity.key = ndb.Key(model, id, parent=key.parent(), namespace=key.namespace(), app=key.app())
+
+def preload(entities, stub=None, write=False):
+    """ Writes entities straight into the datastore stub's storage, skipping put RPCs and hooks """
+    from google.appengine.api import apiproxy_stub_map
+    from google.appengine.datastore import datastore_stub_util
+
+    stub = stub or apiproxy_stub_map.apiproxy.GetStub('datastore_v3')
+    if not hasattr(stub, '_Put'):
+        raise ValueError("%r does not support preloading" % stub)
+
+    _complete_keys(entities)
+    record = getattr(datastore_stub_util, 'EntityRecord', None)
+    for entity in entities:
+        entity._prepare_for_put()
+        pb = entity._to_pb()
+        stub._Put(record(pb) if record else pb, True)
+
+    if write and hasattr(stub, 'Write'):
+        stub.Write()
+    return entities
+
+# --------------------------------------------------------------------
+# Fixture Cache
+# --------------------------------------------------------------------
+
+def _describe(value):
+    code = getattr(value, 'func_code', None)
+    if code is None:
+        return repr(value)
+
+    import hashlib
+    cells = [cell.cell_contents for cell in value.func_closure or ()]
+    digest = hashlib.md5(code.co_code + repr(code.co_consts) + repr(cells)).hexdigest()
+    return '%s.%s:%s' % (value.__module__, value.__name__, digest)
+
+def schema(model):
+    """ Describes a model's properties, including the options their fake values are generated with """
+    fields = []
+    for name, prop in sorted(model._properties.iteritems()):
+        options = prop._fake_options() if isinstance(prop, Property) else {}
+        fields.append((name, type(prop).__name__, prop._repeated, prop._indexed,
+                       sorted((option, _describe(value)) for option, value in options.iteritems())))
+    return fields
+
+class FixtureCache(object):
+    """ Serialises generated datasets to local files keyed by model schema, seed and count """
+
+    MAGIC = 'NDBFAKER1\n'
+
+    # options that only pace, retry or observe writes and leave the generated data unchanged
+    PACING_OPTIONS = ('batch_size', 'rate', 'group_rate', 'progress', 'stats', 'warm_cache', 'retries', 'backoff')
+
+    def __init__(self, directory, batch_size=500, preload=False):
+        self.directory = directory
+        self.batch_size = batch_size
+        self.preload = preload
+
+    @classmethod
+    def key(cls, model, count, seed=0, **options):
+        import hashlib
+        options = sorted((name, _describe(value)) for name, value in options.iteritems()
+                         if name not in cls.PACING_OPTIONS)
+        description = (model._get_kind(), schema(model), count, seed, options)
+        return hashlib.sha1(repr(description)).hexdigest()
+
+    def path(self, model, count, seed=0, **options):
+        return os.path.join(self.directory, '%s-%s.fixture' % (model._get_kind(), self.key(model, count, seed, **options)))
+
+    def read(self, model, path):
+        from google.appengine.datastore import entity_pb
+
+        entities = []
+        with open(path, 'rb') as fh:
+            if fh.read(len(self.MAGIC)) != self.MAGIC:
+                raise ValueError("%s is not a fixture file" % path)
+            while True:
+                header = fh.read(4)
+                if not header:
+                    break
+                pb = entity_pb.EntityProto(fh.read(struct.unpack('<I', header)[0]))
+                entities.append(model._from_pb(pb))
+        return entities
+
+    def write(self, path, entities):
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+
+        with _replace(path) as fh:
+            fh.write(self.MAGIC)
+            for entity in entities:
+                data = entity._to_pb().Encode()
+                fh.write(struct.pack('<I', len(data)))
+                fh.write(data)
+
+    def load(self, model, count, seed=0, **options):
+        path = self.path(model, count, seed, **options)
+        if not os.path.exists(path):
+            return None
+
+        entities = self.read(model, path)
+        if self.preload:
+            return preload(entities)
+
+        for start in xrange(0, len(entities), self.batch_size):
+            ndb.put_multi(entities[start:start + self.batch_size])
+        return entities
+
+    def generate(self, model, count, seed=0, **options):
+        entities = self.load(model, count, seed, **options)
+        if entities is not None:
+            return entities
+
+        state = random.getstate()
+        random.seed(_derive_seed(seed))
+        try:
+            entities = model.generate(count, **options)
+        finally:
+            random.setstate(state)
+
+        self.write(self.path(model, count, seed, **options), entities)
+        return entities
 
 # --------------------------------------------------------------------
 # Base Property
@@ -132,28 +1844,60 @@ class Model(ndb.Model):
 
 class Property(ndb.Property):
 
+    # whether Model._build fills scalar values for a whole batch of entities at once
+    _batched = False
+
     def __init__(self, length=1, **kwargs):
-        try:
-            self._length = int(length)
-        except (ValueError, TypeError):
-            raise ValueError("length must be an integer received %r" % length)
+        self._length = _sampler(length, 'length')
+        self._length_spec = length
 
         super(Property, self).__init__(**kwargs)
 
+    def _fake_options(self):
+        return dict(length=self._length_spec)
+
     def _get_fake_value(self, entity):
         raise NotImplementedError()
 
+    def _generate(self, entity):
+        if self._repeated:
+            return [self._get_fake_value(entity) for x in xrange(self._length())]
+        return self._get_fake_value(entity)
+
     def _prepare_for_put(self, entity):
         if not self._has_value(entity):
             value = self._get_user_value(entity)
             if not value:
-                if self._repeated:
-                    value = [self._get_fake_value(entity) for x in xrange(self._length)]
-                else:
-                    value = self._get_fake_value(entity)
+                value = self._generate(entity)
 
             self._store_value(entity, value)
 
+    def _fake_values(self, owners):
+        # each value is drawn with the faker of the entity it belongs to
+        fake = self._get_fake_value
+        return [fake(entity) for entity in owners]
+
+    def _prepare_batch(self, entities):
+        # draws every list length, then every element, for a whole batch of entities in flat passes
+        pending = [entity for entity in entities
+                   if not self._has_value(entity) and not self._get_user_value(entity)]
+        if not pending:
+            return
+
+        if not self._repeated:
+            for entity, value in zip(pending, self._fake_values(pending)):
+                self._store_value(entity, value)
+            return
+
+        length = self._length
+        lengths = [length() for entity in pending]
+        values = self._fake_values([entity for entity, length in zip(pending, lengths) for x in xrange(length)])
+
+        start = 0
+        for entity, length in zip(pending, lengths):
+            self._store_value(entity, values[start:start + length])
+            start += length
+
 # --------------------------------------------------------------------
 # Fake Property
 # --------------------------------------------------------------------
@@ -164,15 +1908,18 @@ class FakeProperty(Property):
 
     def __init__(self, fake=None, **kwargs):
         if fake is not None:
-            try:
-                getattr(Faker, fake)
-            except (TypeError, AttributeError):
+            if not Faker.provides(fake):
                 raise ValueError("fake must be a valid method of Faker class received %s" % str(fake))
 
             self._fake = fake
 
         super(FakeProperty, self).__init__(**kwargs)
 
+    def _fake_options(self):
+        options = super(FakeProperty, self)._fake_options()
+        options['fake'] = self._fake
+        return options
+
     def _get_fake_value(self, entity):
         if self._fake:
             return getattr(entity._faker, self._fake)()
@@ -185,6 +1932,35 @@ class FakeProperty(Property):
     def _get_fallback_value(self, entity):
         raise NotImplementedError()
 
+# --------------------------------------------------------------------
+# Sized Property
+# --------------------------------------------------------------------
+
+class SizedProperty(FakeProperty):
+
+    _size = None
+
+    def __init__(self, size=None, **kwargs):
+        if size is not None:
+            self._size = _sampler(size, 'size')
+        self._size_spec = size
+
+        super(SizedProperty, self).__init__(**kwargs)
+
+    def _fake_options(self):
+        options = super(SizedProperty, self)._fake_options()
+        options['size'] = self._size_spec
+        return options
+
+    def _get_fake_value(self, entity):
+        if self._size:
+            return self._get_sized_value(entity, self._size())
+
+        return super(SizedProperty, self)._get_fake_value(entity)
+
+    def _get_sized_value(self, entity, size):
+        return entity._faker._text(size)
+
 # --------------------------------------------------------------------
 # Integer Property
 # --------------------------------------------------------------------
@@ -216,7 +1992,7 @@ class BooleanProperty(FakeProperty, ndb.BooleanProperty):
 # Text Property
 # --------------------------------------------------------------------
 
-class TextProperty(FakeProperty, ndb.TextProperty):
+class TextProperty(SizedProperty, ndb.TextProperty):
 
     def _get_fallback_value(self, entity):
         return entity._faker.lorem()
@@ -225,7 +2001,7 @@ class TextProperty(FakeProperty, ndb.TextProperty):
 # String Property
 # --------------------------------------------------------------------
 
-class StringProperty(FakeProperty, ndb.StringProperty):
+class StringProperty(SizedProperty, ndb.StringProperty):
 
     def _get_fallback_value(self, entity):
         return entity._faker.caption()
@@ -270,8 +2046,102 @@ class TimeProperty(FakeProperty, ndb.TimeProperty):
 # GeoPt Property
 # --------------------------------------------------------------------
 
+# major city centres as (latitude, longitude, weight, spread in km), weighted by metro population
+CITIES = [
+    (35.68, 139.69, 37, 25), (28.61, 77.21, 31, 20), (31.23, 121.47, 27, 20),
+    (-23.55, -46.63, 22, 20), (19.43, -99.13, 22, 20), (30.04, 31.24, 21, 15),
+    (23.81, 90.41, 21, 10), (19.08, 72.88, 20, 10), (39.90, 116.41, 20, 20),
+    (40.71, -74.01, 19, 20), (-34.60, -58.38, 15, 15), (41.01, 28.98, 15, 15),
+    (6.52, 3.38, 14, 15), (34.05, -118.24, 12, 30), (55.76, 37.62, 12, 15),
+    (48.86, 2.35, 11, 10), (51.51, -0.13, 9, 15), (-33.87, 151.21, 5, 20),
+    ]
+
+def geohash(latitude, longitude, precision=6):
+    lat, lon = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, value, even = [], 0, 0, True
+    while len(chars) < precision:
+        bounds, point = (lon, longitude) if even else (lat, latitude)
+        middle = (bounds[0] + bounds[1]) / 2
+        value <<= 1
+        if point >= middle:
+            value |= 1
+            bounds[0] = middle
+        else:
+            bounds[1] = middle
+
+        even, bits = not even, bits + 1
+        if bits == 5:
+            chars.append('0123456789bcdefghjkmnpqrstuvwxyz'[value])
+            bits = value = 0
+    return ''.join(chars)
+
 class GeoPtProperty(FakeProperty, ndb.GeoPtProperty):
 
+    def __init__(self, clusters=None, grid=None, cell_size=0.1, **kwargs):
+        if clusters is not None and grid is not None:
+            raise ValueError("clusters and grid cannot be combined")
+
+        self._centres = None
+        if clusters is not None:
+            self._centres = [(float(lat), float(lon), float(spread)) for lat, lon, weight, spread in clusters]
+            self._weights = self._cumulative([weight for lat, lon, weight, spread in clusters], 'clusters')
+        elif grid is not None:
+            self._cells = [(float(lat), float(lon)) for lat, lon, weight in grid]
+            self._weights = self._cumulative([weight for lat, lon, weight in grid], 'grid')
+        self._grid = grid is not None
+        self._cell_size = float(cell_size)
+        self._batched = self._centres is not None or self._grid
+
+        super(GeoPtProperty, self).__init__(**kwargs)
+
+    @staticmethod
+    def _cumulative(weights, name):
+        totals, total = [], 0.0
+        for weight in weights:
+            total += float(weight)
+            totals.append(total)
+        if not totals or total <= 0:
+            raise ValueError("%s must contain positive weights received %r" % (name, weights))
+        return totals
+
+    def _fake_options(self):
+        options = super(GeoPtProperty, self)._fake_options()
+        options.update(clusters=self._centres, weights=getattr(self, '_weights', None),
+                       cells=getattr(self, '_cells', None), cell_size=self._cell_size)
+        return options
+
+    def _draw(self, count):
+        import bisect
+
+        total, points = self._weights[-1], []
+        for x in xrange(count):
+            index = bisect.bisect_right(self._weights, random.uniform(0, total))
+            index = min(index, len(self._weights) - 1)
+            if self._grid:
+                lat, lon = self._cells[index]
+                lat += random.uniform(0, self._cell_size)
+                lon += random.uniform(0, self._cell_size)
+            else:
+                lat, lon, spread = self._centres[index]
+                lat = random.gauss(lat, spread / 111.32)
+                lon = random.gauss(lon, spread / (111.32 * max(math.cos(math.radians(lat)), 0.01)))
+
+            lat = max(-90.0, min(90.0, lat))
+            lon = (lon + 180.0) % 360.0 - 180.0
+            points.append(ndb.GeoPt(lat, lon))
+        return points
+
+    def _fake_values(self, owners):
+        # a whole build batch of points is drawn in one pass, straight from the current stream
+        if self._batched:
+            return self._draw(len(owners))
+        return super(GeoPtProperty, self)._fake_values(owners)
+
+    def _get_fake_value(self, entity):
+        if self._batched:
+            return self._draw(1)[0]
+        return super(GeoPtProperty, self)._get_fake_value(entity)
+
     def _get_fallback_value(self, entity):
         return entity._faker.coordinates()
 
@@ -293,11 +2163,61 @@ class UserProperty(FakeProperty, ndb.UserProperty):
     def _get_fallback_value(self, entity):
         return entity._faker.user()
 
+# --------------------------------------------------------------------
+# Payload Property
+# --------------------------------------------------------------------
+
+class PayloadProperty(SizedProperty):
+
+    _depth = None
+
+    def __init__(self, depth=None, fanout=4, keys=32, variants=None, **kwargs):
+        if depth is not None:
+            self._depth = _positive(depth, 'depth')
+        self._fanout = _positive(fanout, 'fanout')
+        self._keys = _positive(keys, 'keys')
+        self._variants = _positive(variants, 'variants') if variants is not None else None
+        self._pool = threading.local()
+
+        super(PayloadProperty, self).__init__(**kwargs)
+
+        if self._variants is not None and self._size is None and self._depth is None:
+            raise ValueError("variants requires a size or depth received %r" % variants)
+
+    def _fake_options(self):
+        options = super(PayloadProperty, self)._fake_options()
+        options.update(depth=self._depth, fanout=self._fanout, keys=self._keys, variants=self._variants)
+        return options
+
+    def _document(self, entity):
+        size = self._size() if self._size else None
+        return entity._faker._document(size, self._depth or 2, self._fanout, self._keys)
+
+    def _get_fake_value(self, entity):
+        if self._size is None and self._depth is None:
+            return super(PayloadProperty, self)._get_fake_value(entity)
+        if self._variants is None:
+            return self._document(entity)
+
+        # variants are kept as base values, which ndb writes without serialising them again
+        variants = getattr(self._pool, 'variants', None)
+        if variants is None:
+            variants = self._pool.variants = []
+        if len(variants) < self._variants:
+            value = ndb.model._BaseValue(self._call_to_base_type(self._document(entity)))
+            variants.append(value)
+            return value
+        return random.choice(variants)
+
+    def _reset_variants(self):
+        # pools are per thread and per run, so every seeded run draws its own variants from its stream
+        self._pool.variants = []
+
 # --------------------------------------------------------------------
 # Json Property
 # --------------------------------------------------------------------
 
-class JsonProperty(FakeProperty, ndb.JsonProperty):
+class JsonProperty(PayloadProperty, ndb.JsonProperty):
 
     def _get_fallback_value(self, entity):
         return entity._faker.profile()
@@ -306,7 +2226,7 @@ class JsonProperty(FakeProperty, ndb.JsonProperty):
 # Pickle Property
 # --------------------------------------------------------------------
 
-class PickleProperty(FakeProperty, ndb.PickleProperty):
+class PickleProperty(PayloadProperty, ndb.PickleProperty):
 
     def _get_fallback_value(self, entity):
         return entity._faker.profile()
@@ -318,6 +2238,24 @@ class PickleProperty(FakeProperty, ndb.PickleProperty):
 class ComputedProperty(ndb.ComputedProperty):
     pass
 
+# --------------------------------------------------------------------
+# Geohash Property
+# --------------------------------------------------------------------
+
+class GeohashProperty(ndb.ComputedProperty):
+
+    def __init__(self, source, precision=6, **kwargs):
+        self._source = source
+        self._precision = _positive(precision, 'precision')
+        super(GeohashProperty, self).__init__(self._compute, **kwargs)
+
+    def _compute(self, entity):
+        value = getattr(entity, self._source)
+        if isinstance(value, list):
+            return [geohash(point.lat, point.lon, self._precision) for point in value]
+        if value is not None:
+            return geohash(value.lat, value.lon, self._precision)
+
 # --------------------------------------------------------------------
 # Structured Property
 # --------------------------------------------------------------------
@@ -336,18 +2274,38 @@ class LocalStructuredProperty(ndb.LocalStructuredProperty):
 # Blob Property
 # --------------------------------------------------------------------
 
-class BlobProperty(ndb.BlobProperty):
+class BlobProperty(SizedProperty, ndb.BlobProperty):
+
+    def __init__(self, compressibility=0.0, **kwargs):
+        try:
+            self._compressibility = float(compressibility)
+        except (ValueError, TypeError):
+            raise ValueError("compressibility must be a float received %r" % compressibility)
+
+        if not 0.0 <= self._compressibility <= 1.0:
+            raise ValueError("compressibility must be between 0.0 and 1.0 received %r" % compressibility)
 
-    def __init__(self, **kwargs):
-        raise NotImplementedError()
         super(BlobProperty, self).__init__(**kwargs)
 
+    def _fake_options(self):
+        options = super(BlobProperty, self)._fake_options()
+        options['compressibility'] = self._compressibility
+        return options
+
+    def _get_sized_value(self, entity, size):
+        return entity._faker._blob(size, self._compressibility)
+
+    def _get_fallback_value(self, entity):
+        return entity._faker._blob(compressibility=self._compressibility)
+
 # --------------------------------------------------------------------
 # Blob Key Property
 # --------------------------------------------------------------------
 
-class BlobKeyProperty(ndb.BlobKeyProperty):
+class BlobKeyProperty(SizedProperty, ndb.BlobKeyProperty):
 
-    def __init__(self, **kwargs):
-        raise NotImplementedError()
-        super(BlobKeyProperty, self).__init__(**kwargs)
+    def _get_sized_value(self, entity, size):
+        return entity._faker._blob_key(size)
+
+    def _get_fallback_value(self, entity):
+        return entity._faker._blob_key()
@@ -16,15 +16,25 @@ dev_appserver.fix_sys_path()
 
 from google.appengine.ext import testbed
 from google.appengine.ext import ndb
+from google.appengine.ext import blobstore
+from google.appengine.ext import deferred
 
 from google.appengine.datastore import datastore_stub_util
 
+from google.appengine.api import datastore_errors
+from google.appengine.api import memcache
 from google.appengine.api import users
 
 from ndb_faker import model, fake
 
 import datetime
+import json
+import Queue
+import shutil
+import tempfile
+import threading
 import webapp2
+import zlib
 
 # --------------------------------------------------------------------
 # Base Test Case
@@ -171,6 +181,384 @@ class FakeTestCase(BaseTestCase):
         entities = Model.generate(12)
         self.assertEqual(len(entities), 12)
 
+    def test_model_generate_async(self):
+        class Model(model.Model):
+            name = model.StringProperty()
+
+        entities = Model.generate_async(6, batch_size=3).get_result()
+        self.assertEqual(len(entities), 6)
+        self.assertNotIn(None, ndb.get_multi([entity.key for entity in entities]))
+
+    def test_model_generate_rate(self):
+        class Model(model.Model):
+            pass
+
+        bucket = model.TokenBucket(1000)
+        entities = Model.generate(20, batch_size=5, rate=bucket)
+        self.assertEqual(len(entities), 20)
+        self.assertEqual(bucket.report()['count'], 20)
+
+    def test_model_generate_bad_rate(self):
+        class Model(model.Model):
+            pass
+
+        self.assertRaises(ValueError, Model.generate, 12, rate=0)
+        self.assertRaises(ValueError, Model.generate, 12, rate='#badfloat')
+
+    def test_token_bucket_schedules(self):
+        self.assertEqual(model.steady(10)(60), 10)
+        self.assertEqual(model.ramp(10, 20, 10)(5), 15)
+        self.assertEqual(model.ramp(10, 20, 10)(60), 20)
+        self.assertEqual(model.steps((10, 5), (10, 50))(15), 50)
+        self.assertEqual(model.steps((10, 5), (10, 50))(60), 50)
+
+    def test_model_generate_warm_cache(self):
+        self.testbed.init_memcache_stub()
+
+        class Model(model.Model):
+            name = model.StringProperty()
+
+        ctx = ndb.get_context()
+        entities = Model.generate(6, batch_size=3, warm_cache=True)
+        for entity in entities:
+            self.assertIs(ctx._cache[entity.key], entity)
+
+        values = memcache.get_multi([ctx._memcache_prefix + entity.key.urlsafe() for entity in entities])
+        self.assertEqual(len(values), 6)
+
+        ctx.set_memcache_policy(True)
+        ctx.clear_cache()
+        self.assertEqual(entities[0].key.get().name, entities[0].name)
+
+    def test_model_generate_warm_memcache(self):
+        self.testbed.init_memcache_stub()
+
+        class Model(model.Model):
+            pass
+
+        ctx = ndb.get_context()
+        entities = Model.generate(3, batch_size=3, warm_cache='memcache')
+        self.assertNotIn(entities[0].key, ctx._cache)
+        self.assertIsNotNone(memcache.get(ctx._memcache_prefix + entities[0].key.urlsafe()))
+
+    def test_model_generate_batch_size(self):
+        class Model(model.Model):
+            name = model.StringProperty()
+
+        entities = Model.generate(12, batch_size=5)
+        self.assertEqual(len(entities), 12)
+        self.assertNotIn(None, ndb.get_multi([entity.key for entity in entities]))
+
+    def test_model_generate_built_per_batch(self):
+        class Model(model.Model):
+            name = model.StringProperty()
+            chunks = []
+
+            @classmethod
+            def _build(cls, count, *args):
+                cls.chunks.append(count)
+                return super(Model, cls)._build(count, *args)
+
+        entities = Model.generate(250, batch_size=100)
+        self.assertEqual(Model.chunks, [100, 100, 50])
+        self.assertEqual(len(entities), 250)
+        self.assertNotIn(None, [entity.name for entity in entities])
+
+    def test_model_generate_repeated_memoization(self):
+        class Model(model.Model):
+            username = model.StringProperty()
+            email = model.StringProperty(repeated=True, length=2)
+
+        for entity in Model.generate(4, batch_size=4):
+            for email in entity.email:
+                self.assertIn(entity.username, email)
+
+    def test_model_generate_groups(self):
+        class Model(model.Model):
+            name = model.StringProperty()
+
+        entities = Model.generate(12, groups=3, group_rate=1000)
+        parents = set(entity.key.parent() for entity in entities)
+        self.assertEqual(len(parents), 3)
+        self.assertNotIn(None, ndb.get_multi([entity.key for entity in entities]))
+
+    def test_model_generate_per_parent(self):
+        class Model(model.Model):
+            pass
+
+        entities = Model.generate(10, per_parent=4, parent_kind='Account', group_rate=1000)
+        parents = set(entity.key.parent() for entity in entities)
+        self.assertEqual(len(parents), 3)
+        self.assertEqual(set(parent.kind() for parent in parents), set(['Account']))
+
+    def test_model_generate_bad_groups(self):
+        class Model(model.Model):
+            pass
+
+        self.assertRaises(ValueError, Model.generate, 12, groups=0)
+        self.assertRaises(ValueError, Model.generate, 12, per_parent='#badint')
+
+    def test_model_generate_target_bytes(self):
+        class Model(model.Model):
+            name = model.StringProperty(size=100)
+
+        budget = model.ByteBudget(5000)
+        entities = Model.generate(target_bytes=budget, batch_size=10)
+        self.assertEqual(len(entities), budget.count)
+        self.assertGreaterEqual(budget.bytes, 5000)
+        self.assertNotIn(None, ndb.get_multi([entity.key for entity in entities]))
+
+        report = budget.report()
+        self.assertEqual(report['count'], len(entities))
+        self.assertGreater(report['bytes_per_entity'], 100)
+        self.assertLess(report['bytes'], 5000 + 2 * report['bytes_per_entity'])
+        self.assertGreater(report['index_bytes_per_entity'], 2 * 100)
+        self.assertEqual(report['index_bytes'], budget.index_bytes)
+
+    def test_model_generate_target_bytes_variants(self):
+        class Model(model.Model):
+            prop = model.JsonProperty(size=512, variants=2)
+
+        budget = model.ByteBudget(5000)
+        entities = Model.generate(target_bytes=budget, batch_size=10)
+        self.assertGreater(budget.bytes / budget.count, 256)
+        for entity in entities:
+            self.assertIsInstance(Model.prop._retrieve_value(entity), ndb.model._BaseValue)
+
+    def test_model_generate_bad_target_bytes(self):
+        class Model(model.Model):
+            pass
+
+        self.assertRaises(ValueError, Model.generate)
+        self.assertRaises(ValueError, Model.generate, 10, target_bytes=1000)
+        self.assertRaises(ValueError, Model.generate, target_bytes=0)
+        self.assertRaises(ValueError, Model.generate, target_bytes=1000, per_parent=10)
+
+    def test_model_generate_progress(self):
+        class Model(model.Model):
+            name = model.StringProperty()
+
+        reports = []
+        progress = model.Progress(interval=0, callback=reports.append)
+        entities = Model.generate(10, batch_size=3, progress=progress)
+        self.assertEqual(len(entities), 10)
+
+        report = reports[-1]
+        self.assertEqual(report['generated'], 10)
+        self.assertEqual(report['written'], 10)
+        self.assertEqual(report['total'], 10)
+        self.assertEqual(report['eta'], 0)
+        self.assertEqual(report['latency']['count'], 4)
+        self.assertLessEqual(report['latency']['p50'], report['latency']['max'])
+
+        reports = []
+        Model.generate(2, progress=reports.append)
+        self.assertEqual(reports[-1]['written'], 2)
+
+        self.assertRaises(ValueError, model.Progress, callback='#badcallback')
+
+    def test_latency_histogram(self):
+        histogram = model.LatencyHistogram()
+        for x in xrange(1, 101):
+            histogram.add(x / 1000.0)
+
+        report = histogram.report()
+        self.assertEqual(report['count'], 100)
+        self.assertEqual(report['max'], 0.1)
+        self.assertAlmostEqual(report['p50'], 0.05, delta=0.006)
+        self.assertAlmostEqual(report['p90'], 0.09, delta=0.01)
+
+    def test_model_generate_retries(self):
+        class Model(model.Model):
+            name = model.StringProperty()
+
+        put_multi_async, calls = ndb.put_multi_async, []
+        def flaky_put_multi_async(entities, **options):
+            calls.append(len(entities))
+            if len(calls) == 1:
+                future = ndb.Future()
+                future.set_exception(datastore_errors.Timeout())
+                return future
+            return put_multi_async(entities, **options)
+
+        adaptive = model.AdaptiveBatch(size=8)
+        ndb.put_multi_async = flaky_put_multi_async
+        try:
+            entities = Model.generate(8, batch_size=adaptive, retries=2, backoff=0)
+        finally:
+            ndb.put_multi_async = put_multi_async
+
+        self.assertEqual(calls, [8, 4, 4])
+        self.assertEqual(adaptive.errors, 1)
+        self.assertTrue(all(entity.key.id() for entity in entities))
+        self.assertEqual(len(set(entity.key for entity in entities)), 8)
+        self.assertNotIn(None, ndb.get_multi([entity.key for entity in entities]))
+
+        ndb.put_multi_async = flaky_put_multi_async
+        try:
+            del calls[:]
+            self.assertRaises(datastore_errors.Timeout, Model.generate, 4, batch_size=4)
+        finally:
+            ndb.put_multi_async = put_multi_async
+
+    def test_adaptive_batch(self):
+        adaptive = model.AdaptiveBatch(size=10, maximum=25, latency=0.5, step=10)
+        adaptive.success(10, 0.1)
+        self.assertEqual(adaptive(), 20)
+        adaptive.success(5, 0.1)
+        self.assertEqual(adaptive(), 20)
+        adaptive.success(20, 0.1)
+        self.assertEqual(adaptive(), 25)
+        adaptive.success(25, 1.0)
+        self.assertEqual(adaptive(), 12)
+        adaptive.failure()
+        self.assertEqual(adaptive(), 6)
+        self.assertEqual(adaptive.errors, 1)
+
+        self.assertRaises(ValueError, model.AdaptiveBatch, size=0)
+        self.assertRaises(ValueError, model.AdaptiveBatch, decrease=1)
+
+    def test_model_generate_key_strategy(self):
+        class Model(model.Model):
+            pass
+
+        entities = Model.generate(4, key_strategy='sequential')
+        self.assertEqual([entity.key.id() for entity in entities], [1, 2, 3, 4])
+
+        entities = Model.generate(4, key_strategy=model.sequential(scatter=2), offset=10)
+        ids = [entity.key.id() for entity in entities]
+        self.assertEqual(ids[0::2], [6, 7])
+        self.assertEqual([id - (1 << model.ID_BITS) // 2 for id in ids[1::2]], [6, 7])
+
+        entities = Model.generate(100, key_strategy='scattered', batch_size=50)
+        ids = [entity.key.id() for entity in entities]
+        self.assertEqual(len(set(ids)), 100)
+        self.assertNotEqual(ids, sorted(ids))
+        self.assertTrue(all(0 < id < 1 << model.ID_BITS for id in ids))
+
+        entities = Model.generate(100, key_strategy='hashed', batch_size=50)
+        names = [entity.key.id() for entity in entities]
+        self.assertEqual(len(set(names)), 100)
+        self.assertNotEqual(names, sorted(names))
+        self.assertEqual(names[0].split('-')[1], '1')
+        self.assertNotIn(None, ndb.get_multi([entity.key for entity in entities]))
+
+        entities = Model.generate(2, key_strategy=lambda index: 'user%d' % index)
+        self.assertEqual([entity.key.id() for entity in entities], ['user0', 'user1'])
+
+        self.assertRaises(ValueError, Model.generate, 2, key_strategy='#badstrategy')
+        self.assertRaises(ValueError, model.sequential, scatter=0)
+
+    def test_model_mutate(self):
+        class Model(model.Model):
+            name = model.StringProperty()
+            age = model.IntegerProperty()
+
+        entities = Model.generate(20, batch_size=20)
+        keys = [entity.key for entity in entities]
+        before = dict((entity.key, (entity.name, entity.age)) for entity in entities)
+
+        self.assertEqual(Model.mutate(keys, properties=['name'], batch_size=6), 20)
+        after = ndb.get_multi(keys, use_cache=False, use_memcache=False)
+        self.assertEqual([entity.age for entity in after], [before[key][1] for key in keys])
+        self.assertNotEqual([entity.name for entity in after], [before[key][0] for key in keys])
+
+        model.seed(0)
+        count = Model.mutate(keys, fraction=0.5, properties=[Model.age])
+        self.assertTrue(0 < count < 20)
+
+        self.assertRaises(ValueError, Model.mutate, keys, fraction=0)
+        self.assertRaises(ValueError, Model.mutate, keys, properties=['#badproperty'])
+
+    def test_model_mutate_query(self):
+        self.policy.SetProbability(1)
+
+        class Model(model.Model):
+            name = model.StringProperty()
+
+        Model.generate(7, batch_size=7)
+        reports = []
+        self.assertEqual(Model.mutate(batch_size=3, progress=reports.append), 7)
+        self.assertEqual(reports[-1]['written'], 7)
+
+    def test_model_generate_run_id(self):
+        self.policy.SetProbability(1)
+
+        class Model(model.Model):
+            name = model.StringProperty()
+
+        class Other(model.Model):
+            pass
+
+        entities = Model.generate(5, batch_size=5, run_id='run-1', groups=2)
+        self.assertEqual(set(entity.key.namespace() for entity in entities), set(['ndb_faker.run-1']))
+        self.assertEqual(set(entity.key.parent().namespace() for entity in entities), set(['ndb_faker.run-1']))
+        Other.generate(3, batch_size=3, run_id='run-1')
+        kept = Model.generate(4, batch_size=4, run_id='run-2')
+        Model.generate(2, batch_size=2)
+
+        self.assertEqual(Model.purge('run-1', batch_size=2), 5)
+        self.assertEqual(Other.query(namespace='ndb_faker.run-1').count(), 3)
+
+        reports = []
+        self.assertEqual(model.purge('run-1', progress=reports.append), 3)
+        self.assertEqual(reports[-1]['written'], 3)
+        self.assertEqual(ndb.Query(namespace='ndb_faker.run-1').count(), 0)
+        self.assertNotIn(None, ndb.get_multi([entity.key for entity in kept]))
+        self.assertEqual(Model.query().count(), 2)
+
+        # keys completed by the retry path and by preload stay in the run's namespace
+        retried = Model.generate(3, batch_size=3, run_id='run-3', retries=1)
+        preloaded = Model.preload(2, run_id='run-3')
+        self.assertEqual(set(entity.key.namespace() for entity in retried + preloaded), set(['ndb_faker.run-3']))
+        self.assertEqual(Model.purge('run-3'), 5)
+        self.assertEqual(ndb.get_multi([entity.key for entity in retried + preloaded]), [None] * 5)
+
+        self.assertRaises(ValueError, Model.generate, 2, run_id='#bad run')
+        self.assertRaises(ValueError, model.purge, None)
+
+    def test_model_generate_prototypes(self):
+        class Model(model.Model):
+            name = model.StringProperty()
+            tags = model.StringProperty(repeated=True, length=3)
+            score = model.IntegerProperty()
+            created = model.DateTimeProperty()
+
+        entities = Model.generate(20, batch_size=20, prototypes=2, vary=['score', Model.created])
+        self.assertEqual(len(set(entity.name for entity in entities)), 2)
+        self.assertEqual([entity.name for entity in entities[2:4]], [entity.name for entity in entities[:2]])
+        self.assertEqual(entities[0].tags, entities[2].tags)
+        self.assertIsNot(entities[0].tags, entities[2].tags)
+        self.assertGreater(len(set(entity.score for entity in entities)), 2)
+        self.assertGreater(len(set(entity.created for entity in entities)), 2)
+        self.assertEqual(len(set(entity.key for entity in entities)), 20)
+        self.assertNotIn(None, ndb.get_multi([entity.key for entity in entities]))
+
+        prototypes = model.Prototypes(Model, 1)
+        entities = Model.build(3, prototypes=prototypes)
+        self.assertEqual(len(set(entity.score for entity in entities)), 1)
+
+        self.assertRaises(ValueError, Model.generate, 2, prototypes=0)
+        self.assertRaises(ValueError, Model.generate, 2, prototypes=2, vary=['#badproperty'])
+
+    def test_group_scheduler_batches(self):
+        class Model(model.Model):
+            pass
+
+        parents = model.parent_keys(12, groups=4)
+        entities = [Model(parent=parents[i % 2]) for i in xrange(6)] + [Model() for i in xrange(6)]
+        scheduler = model.GroupScheduler()
+
+        batches = list(scheduler.batches(entities, 4))
+        self.assertEqual(sum(len(batch) for batch in batches), 12)
+        for batch in batches:
+            groups = [scheduler.group(entity) for entity in batch]
+            groups = [group for group in groups if group is not None]
+            self.assertEqual(len(groups), len(set(groups)))
+
+        scheduler.written(batches[0])
+        self.assertGreater(scheduler.delay(batches[1]), 0)
+
     def test_model_faker_memoization(self):
         class Model(model.Model):
             pass
@@ -194,12 +582,404 @@ class FakeTestCase(BaseTestCase):
     def test_property_length(self):
         self.assertRaises(ValueError, model.Property, length=None)
         self.assertRaises(ValueError, model.Property, length='#badint')
+        self.assertRaises(ValueError, model.Property, length=(6, 2))
+
+    def test_property_length_range(self):
+        class Model(model.Model):
+            tags = model.StringProperty(repeated=True, length=(0, 8))
+
+        lengths = set()
+        for entity in Model.generate(30, batch_size=10):
+            self.assertTrue(0 <= len(entity.tags) <= 8)
+            lengths.add(len(entity.tags))
+        self.assertGreater(len(lengths), 1)
+
+        entity = Model.create()
+        self.assertTrue(0 <= len(entity.tags) <= 8)
+
+    def test_property_length_callable(self):
+        class Model(model.Model):
+            tags = model.IntegerProperty(repeated=True, length=lambda: 5)
+            names = model.StringProperty(repeated=True)
+
+        for entity in Model.generate(4, batch_size=2):
+            self.assertEqual(len(entity.tags), 5)
+            self.assertEqual(len(entity.names), 1)
+
+        entity = Model.generate(1, batch_size=1)[0]
+        self.assertEqual(len(entity.tags), 5)
+
+    def test_property_size(self):
+        self.assertRaises(ValueError, model.SizedProperty, size='#badint')
+        self.assertRaises(ValueError, model.SizedProperty, size=-1)
+        self.assertRaises(ValueError, model.SizedProperty, size=(20, 10))
 
     def test_property_fake(self):
         self.assertRaises(ValueError, model.FakeProperty, fake='notmethod')
         self.assertRaises(ValueError, model.FakeProperty, fake=123)
         self.assertRaises(ValueError, model.FakeProperty, fake=(123))
 
+    #
+    # Corpus Table
+    # ----------------------------------------------------------------
+
+    def test_corpus_table(self):
+        path = os.path.join(tempfile.mkdtemp(), 'names.table')
+        table = model.CorpusTable.compile(path, ['Ellis', 'Renner', '', 'Makayla'])
+
+        table = model.CorpusTable(path)
+        self.assertEqual(len(table), 4)
+        self.assertEqual(list(table), ['Ellis', 'Renner', '', 'Makayla'])
+        self.assertEqual(table[-1], 'Makayla')
+        self.assertEqual(table[1:3], ['Renner', ''])
+        self.assertRaises(IndexError, table.__getitem__, 4)
+        self.assertIn(model.random.choice(table), list(table))
+
+        table = model.CorpusTable.compile(path, [u'caf\xe9', u'na\xefve'])
+        self.assertEqual(table[0], u'caf\xe9')
+
+    def test_use_corpora(self):
+        class Model(model.Model):
+            name = model.StringProperty()
+            email = model.StringProperty()
+            body = model.TextProperty(size=256)
+
+        # use_corpora swaps module state for the whole process, so put it all back afterwards
+        model.Faker().first_name()
+        lists = [(module, name, value) for module_name, module in sys.modules.items()
+                 if module is not None and (module_name == 'faker' or module_name.startswith('faker.'))
+                 for name, value in vars(module).items() if name.isupper() and isinstance(value, (list, tuple))]
+        buffers = [(corpus, corpus._buffer) for corpus in (model.LOREM, model.NOISE)]
+
+        def restore():
+            for module, name, value in lists:
+                setattr(module, name, value)
+            for corpus, buffer in buffers:
+                corpus._buffer = buffer
+
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, True)
+        self.addCleanup(restore)
+        self.assertGreater(model.use_corpora(directory), 0)
+        self.assertGreater(model.use_corpora(directory), 0)
+
+        entity = Model.create()
+        self.assertIsInstance(entity.name, basestring)
+        self.assertEqual(len(entity.body), 256)
+
+    #
+    # Random
+    # ----------------------------------------------------------------
+
+    def test_thread_random_streams(self):
+        def draw():
+            results = {}
+
+            def worker(stream):
+                model.seed_thread(stream)
+                results[stream] = [model.random.random() for x in xrange(6)]
+
+            threads = [threading.Thread(target=worker, args=(i,)) for i in xrange(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            return results
+
+        model.seed(42)
+        first = draw()
+        model.seed(42)
+        self.assertEqual(draw(), first)
+        self.assertEqual(len(set(tuple(values) for values in first.values())), 4)
+
+    def test_thread_random_reseed(self):
+        # a pooled worker keeps its thread-local stream from one run to the next
+        jobs, results = Queue.Queue(), Queue.Queue()
+
+        def worker():
+            for job in iter(jobs.get, None):
+                results.put([model.random.random() for x in xrange(3)])
+
+        thread = threading.Thread(target=worker)
+        thread.start()
+
+        def run():
+            model.seed(5)
+            jobs.put(True)
+            return results.get()
+
+        first = run()
+        second = run()
+        jobs.put(None)
+        thread.join()
+        self.assertEqual(first, second)
+
+    def test_thread_random_faker(self):
+        class Model(model.Model):
+            name = model.StringProperty()
+            age = model.IntegerProperty()
+
+        def names():
+            model.seed_thread(1)
+            return [(entity.name, entity.age) for entity in Model.generate(5, batch_size=5)]
+
+        model.seed(7)
+        self.assertEqual(names(), names())
+
+    #
+    # Index Estimate
+    # ----------------------------------------------------------------
+
+    def test_model_estimate(self):
+        class Model(model.Model):
+            name = model.StringProperty()
+            tags = model.StringProperty(repeated=True, length=4)
+            body = model.TextProperty()
+
+        report = Model.estimate(indexes=[('name', 'tags')])
+        self.assertEqual(report['properties']['name']['index_writes'], 2)
+        self.assertEqual(report['properties']['tags']['index_writes'], 8)
+        self.assertEqual(report['properties']['body']['index_writes'], 0)
+        self.assertEqual(report['composite_writes'], 4)
+        self.assertEqual(report['index_writes'], 14)
+        self.assertEqual(report['writes'], 16)
+        self.assertGreater(report['index_bytes'], 0)
+        self.assertGreater(report['entity_bytes'], report['properties']['body']['bytes'])
+
+    def test_model_estimate_index_yaml(self):
+        class Model(model.Model):
+            name = model.StringProperty()
+            tags = model.StringProperty(repeated=True, length=3)
+
+        path = os.path.join(tempfile.mkdtemp(), 'index.yaml')
+        with open(path, 'w') as fh:
+            fh.write('indexes:\n'
+                     '- kind: Model\n  properties:\n  - name: name\n  - name: tags\n'
+                     '- kind: Other\n  properties:\n  - name: name\n  - name: tags\n')
+
+        self.assertEqual(Model.estimate(indexes=path)['composite_writes'], 3)
+
+    def test_model_unindex(self):
+        class Model(model.Model):
+            name = model.StringProperty()
+            email = model.StringProperty()
+            tags = model.StringProperty(repeated=True, length=3)
+            body = model.TextProperty()
+
+        self.assertEqual(Model.unindex(keep=['name'], indexes=[('email', 'name')]), ['tags'])
+        self.assertEqual(Model.estimate()['index_writes'], 4)
+
+        entity = Model.create()
+        self.assertEqual(len(entity.tags), 3)
+
+    #
+    # Query Workload
+    # ----------------------------------------------------------------
+
+    def test_value_stats(self):
+        class Model(model.Model):
+            name = model.StringProperty()
+            age = model.IntegerProperty()
+            tags = model.StringProperty(repeated=True, length=2)
+            body = model.TextProperty()
+
+        stats = model.ValueStats(Model, size=10)
+        entities = Model.generate(30, batch_size=10, stats=stats)
+
+        self.assertEqual(stats.count, 30)
+        self.assertEqual(len(stats.samples), 10)
+        self.assertEqual(stats.names, ['age', 'name', 'tags'])
+        self.assertEqual(stats.ranges['age'], [min(e.age for e in entities), max(e.age for e in entities)])
+        self.assertEqual(len(stats.values('tags')), 20)
+        self.assertGreater(stats.cardinality('name'), 1)
+
+        def ages(stats=None):
+            model.seed(3)
+            return [entity.age for entity in Model.generate(30, batch_size=10, stats=stats)]
+
+        self.assertEqual(ages(model.ValueStats(Model, size=5)), ages())
+
+    def test_query_workload(self):
+        self.policy.SetProbability(1)
+
+        class Model(model.Model):
+            name = model.StringProperty()
+            age = model.IntegerProperty()
+            tags = model.StringProperty(repeated=True, length=3)
+
+        stats = model.ValueStats(Model)
+        Model.generate(50, batch_size=25, stats=stats)
+
+        workload = model.QueryWorkload(stats, hit_rate=1.0, selectivity=0.1)
+        report = model.run_queries(workload.queries(40))
+        self.assertEqual(report['count'], 40)
+        self.assertEqual(report['hit_rate'], 1.0)
+        self.assertEqual(set(report['kinds']), set(model.QueryWorkload.KINDS))
+        self.assertLessEqual(report['p50'], report['p99'])
+
+        workload = model.QueryWorkload(stats, hit_rate=0.0)
+        report = model.run_queries(workload.queries(20))
+        self.assertEqual(report['hit_rate'], 0.0)
+        self.assertEqual(report['expected_hit_rate'], 0.0)
+
+    #
+    # Preload
+    # ----------------------------------------------------------------
+
+    def test_model_build(self):
+        class Model(model.Model):
+            name = model.StringProperty()
+
+        entities = Model.build(5, groups=2)
+        self.assertEqual(len(entities), 5)
+        for entity in entities:
+            self.assertIsInstance(entity.name, basestring)
+            self.assertIsNone(entity.key.id())
+
+        self.policy.SetProbability(1)
+        self.assertEqual(Model.query().count(), 0)
+
+    def test_model_preload(self):
+        class Model(model.Model):
+            name = model.StringProperty()
+            tags = model.StringProperty(repeated=True, length=3)
+
+        entities = Model.preload(100)
+        self.assertEqual(len(set(entity.key for entity in entities)), 100)
+
+        loaded = ndb.get_multi([entity.key for entity in entities])
+        self.assertEqual([e.name for e in loaded], [e.name for e in entities])
+        self.assertEqual(len(loaded[0].tags), 3)
+
+        # ids were allocated, so later puts never collide with preloaded entities
+        self.assertNotIn(Model.create().key, set(entity.key for entity in entities))
+
+    def test_fixture_cache_preload(self):
+        class Model(model.Model):
+            name = model.StringProperty()
+
+        cache = model.FixtureCache(tempfile.mkdtemp(), preload=True)
+        entities = cache.generate(Model, 10, seed=5, batch_size=10)
+        keys = [entity.key for entity in entities]
+        ndb.delete_multi(keys)
+
+        cache.generate(Model, 10, seed=5)
+        self.assertNotIn(None, ndb.get_multi(keys))
+
+    #
+    # Fixture Cache
+    # ----------------------------------------------------------------
+
+    def test_fixture_cache(self):
+        class Model(model.Model):
+            name = model.StringProperty()
+            tags = model.StringProperty(repeated=True, length=(1, 4))
+
+        cache = model.FixtureCache(tempfile.mkdtemp())
+        entities = cache.generate(Model, 10, seed=3, batch_size=5)
+        self.assertTrue(os.path.exists(cache.path(Model, 10, seed=3)))
+
+        keys = [entity.key for entity in entities]
+        ndb.delete_multi(keys)
+
+        loaded = cache.generate(Model, 10, seed=3, batch_size=10)
+        self.assertEqual([(e.key, e.name, e.tags) for e in loaded], [(e.key, e.name, e.tags) for e in entities])
+        self.assertNotIn(None, ndb.get_multi(keys))
+
+    def test_fixture_cache_key(self):
+        cache = model.FixtureCache(tempfile.mkdtemp())
+
+        class Model(model.Model):
+            name = model.StringProperty()
+        key = cache.key(Model, 10, seed=1)
+
+        self.assertEqual(cache.key(Model, 10, seed=1, batch_size=50), key)
+        self.assertEqual(cache.key(Model, 10, seed=1, progress=[].append, stats=model.ValueStats(Model),
+                                   warm_cache=True, retries=3, backoff=0.5), key)
+        self.assertNotEqual(cache.key(Model, 10, seed=2), key)
+        self.assertNotEqual(cache.key(Model, 20, seed=1), key)
+
+        class Model(model.Model):
+            name = model.StringProperty(fake='email')
+        self.assertNotEqual(cache.key(Model, 10, seed=1), key)
+
+        class Model(model.Model):
+            name = model.StringProperty(repeated=True, length=lambda: 2)
+        length = cache.key(Model, 10, seed=1)
+
+        class Model(model.Model):
+            name = model.StringProperty(repeated=True, length=lambda: 3)
+        self.assertNotEqual(cache.key(Model, 10, seed=1), length)
+
+    #
+    # Generation Job
+    # ----------------------------------------------------------------
+
+    def test_generation_job(self):
+        class Model(model.Model):
+            name = model.StringProperty()
+
+        job = model.GenerationJob(Model, 25, chunk_size=10, seed=1)
+        self.assertTrue(job.run())
+        self.assertEqual(job.checkpoint.load(), 3)
+
+        keys = [ndb.Key(Model, i) for i in xrange(1, 27)]
+        self.assertEqual([entity is not None for entity in ndb.get_multi(keys)], [True] * 25 + [False])
+
+        # options that change the data get their own checkpoint, pacing options share it
+        self.assertEqual(model.GenerationJob(Model, 25, chunk_size=10, seed=1, batch_size=5).name, job.name)
+        job = model.GenerationJob(Model, 25, chunk_size=10, seed=1, run_id='other')
+        self.assertEqual(job.checkpoint.load(), 0)
+        self.assertTrue(job.run())
+
+        keys = [ndb.Key(Model, i, namespace=model.run_namespace('other')) for i in xrange(1, 26)]
+        self.assertNotIn(None, ndb.get_multi(keys))
+
+    def test_generation_job_resume(self):
+        class Model(model.Model):
+            name = model.StringProperty()
+            age = model.IntegerProperty()
+            location = model.GeoPtProperty(clusters=model.CITIES)
+
+        keys = [ndb.Key(Model, i) for i in xrange(1, 31)]
+
+        def dataset():
+            return [(e.key.id(), e.name, e.age, e.location) for e in ndb.get_multi(keys)]
+
+        model.GenerationJob(Model, 30, chunk_size=10, seed=7, name='uninterrupted').run()
+        expected = dataset()
+        ndb.delete_multi(keys)
+
+        path = os.path.join(tempfile.mkdtemp(), 'checkpoint')
+        job = model.GenerationJob(Model, 30, chunk_size=10, seed=7, checkpoint=model.LocalCheckpoint(path))
+        self.assertFalse(job.run(deadline=0))
+        self.assertEqual(job.checkpoint.load(), 1)
+
+        job = model.GenerationJob(Model, 30, chunk_size=10, seed=7, checkpoint=model.LocalCheckpoint(path))
+        self.assertTrue(job.run())
+        self.assertEqual(dataset(), expected)
+
+    def test_model_fan_out(self):
+        self.testbed.init_taskqueue_stub()
+        stub = self.testbed.get_stub(testbed.TASKQUEUE_SERVICE_NAME)
+
+        class Model(model.Model):
+            name = model.StringProperty()
+
+        ranges = Model.fan_out(25, shards=3, chunk_size=5, seed=3)
+        self.assertEqual(ranges, [(0, 1), (1, 3), (3, 5)])
+
+        # shards are named tasks, so fanning out twice enqueues nothing new
+        Model.fan_out(25, shards=3, chunk_size=5, seed=3)
+        tasks = stub.get_filtered_tasks()
+        self.assertEqual(len(tasks), 3)
+
+        for task in tasks:
+            deferred.run(task.payload)
+
+        keys = [ndb.Key(Model, i) for i in xrange(1, 26)]
+        self.assertNotIn(None, ndb.get_multi(keys))
+
     #
     # Integer Property
     # ----------------------------------------------------------------
@@ -428,6 +1208,21 @@ class FakeTestCase(BaseTestCase):
 
         self.assertEqual(len(entity.prop), 6)
 
+    def test_string_property_size(self):
+        class Model(model.Model):
+            name = model.StringProperty(size=128)
+        entity = Model.create()
+
+        self.assertEqual(len(entity.name), 128)
+        self.assertEqual(entity.name, entity.name.strip())
+
+    def test_string_property_value_text(self):
+        class Model(model.Model):
+            text = model.StringProperty()
+        entity = Model.create()
+
+        self.assertTrue(0 < len(entity.text) <= 64)
+
     #
     # Text Property
     # ----------------------------------------------------------------
@@ -485,6 +1280,21 @@ class FakeTestCase(BaseTestCase):
 
         self.assertEqual(len(entity.prop), 6)
 
+    def test_text_property_size(self):
+        class Model(model.Model):
+            prop = model.TextProperty(size=500 * 1024)
+        entity = Model.create()
+
+        self.assertEqual(len(entity.prop), 500 * 1024)
+
+    def test_text_property_size_range(self):
+        class Model(model.Model):
+            prop = model.TextProperty(size=(10, 20), repeated=True, length=12)
+        entity = Model.create()
+
+        for value in entity.prop:
+            self.assertTrue(10 <= len(value) <= 20)
+
     #
     # Generic Property
     # ----------------------------------------------------------------
@@ -839,6 +1649,40 @@ class FakeTestCase(BaseTestCase):
 
         self.assertEqual(len(entity.prop), 6)
 
+    def test_geopt_property_clusters(self):
+        class Model(model.Model):
+            location = model.GeoPtProperty(clusters=[(51.51, -0.13, 3, 5), (40.71, -74.01, 1, 5)])
+            cell = model.GeohashProperty('location', precision=5)
+
+        entities = Model.generate(40, batch_size=20)
+        london = [e for e in entities if abs(e.location.lat - 51.51) < 1 and abs(e.location.lon + 0.13) < 1]
+        new_york = [e for e in entities if abs(e.location.lat - 40.71) < 1 and abs(e.location.lon + 74.01) < 1]
+
+        self.assertEqual(len(london) + len(new_york), 40)
+        self.assertGreater(len(london), len(new_york))
+        for entity in entities:
+            self.assertEqual(entity.cell, model.geohash(entity.location.lat, entity.location.lon, 5))
+
+    def test_geopt_property_grid(self):
+        class Model(model.Model):
+            location = model.GeoPtProperty(grid=[(10, 20, 1), (-30, 40, 0)], cell_size=0.5,
+                                           repeated=True, length=5)
+            cells = model.GeohashProperty('location', repeated=True)
+        entity = Model.create()
+
+        for point in entity.location:
+            self.assertTrue(10 <= point.lat <= 10.5 and 20 <= point.lon <= 20.5)
+        self.assertEqual(len(entity.cells), 5)
+
+    def test_geopt_property_bad_clusters(self):
+        self.assertRaises(ValueError, model.GeoPtProperty, clusters=[])
+        self.assertRaises(ValueError, model.GeoPtProperty, grid=[(10, 20, 0)])
+        self.assertRaises(ValueError, model.GeoPtProperty, clusters=model.CITIES, grid=[(10, 20, 1)])
+
+    def test_geohash(self):
+        self.assertEqual(model.geohash(57.64911, 10.40744, 11), 'u4pruydqqvj')
+        self.assertEqual(model.geohash(-25.382708, -49.265506, 8), '6gkzwgjz')
+
     #
     # Key Property
     # ----------------------------------------------------------------
@@ -953,6 +1797,54 @@ class FakeTestCase(BaseTestCase):
 
         self.assertEqual(len(entity.prop), 6)
 
+    def test_json_property_shape(self):
+        class Model(model.Model):
+            prop = model.JsonProperty(depth=3, fanout=2, keys=5)
+        entity = Model.create()
+
+        self.assertEqual(len(entity.prop), 2)
+        leaves = [leaf for branch in entity.prop.values() for node in branch.values() for leaf in node.values()]
+        self.assertEqual(len(leaves), 8)
+        self.assertTrue(all(not isinstance(leaf, dict) for leaf in leaves))
+        self.assertTrue(set(entity.prop) <= set('field%d' % x for x in xrange(5)))
+
+    def test_json_property_size(self):
+        class Model(model.Model):
+            prop = model.JsonProperty(size=4096)
+        entity = Model.create()
+
+        self.assertAlmostEqual(len(json.dumps(entity.prop)), 4096, delta=1024)
+
+    def test_json_property_variants(self):
+        class Model(model.Model):
+            prop = model.JsonProperty(size=512, variants=2)
+
+        entities = Model.generate(10, batch_size=10)
+        entities = ndb.get_multi([entity.key for entity in entities], use_cache=False, use_memcache=False)
+        self.assertEqual(len(set(json.dumps(entity.prop, sort_keys=True) for entity in entities)), 2)
+        self.assertEqual(len(Model.prop._pool.variants), 2)
+
+        def payloads():
+            model.seed(9)
+            return [json.dumps(entity.prop, sort_keys=True) for entity in Model.generate(4, batch_size=4)]
+
+        self.assertEqual(payloads(), payloads())
+
+    def test_json_property_names(self):
+        class Model(model.Model):
+            document = model.StringProperty()
+            text = model.TextProperty()
+        entity = Model.create()
+
+        self.assertIsInstance(entity.document, basestring)
+        self.assertIsInstance(entity.text, basestring)
+
+    def test_json_property_bad_shape(self):
+        self.assertRaises(ValueError, model.JsonProperty, depth=0)
+        self.assertRaises(ValueError, model.JsonProperty, fanout='#badint')
+        self.assertRaises(ValueError, model.JsonProperty, variants=0)
+        self.assertRaises(ValueError, model.JsonProperty, variants=10)
+
     #
     # Pickle Property
     # ----------------------------------------------------------------
@@ -1010,6 +1902,15 @@ class FakeTestCase(BaseTestCase):
 
         self.assertEqual(len(entity.prop), 6)
 
+    def test_pickle_property_variants(self):
+        class Model(model.Model):
+            prop = model.PickleProperty(depth=1, fanout=3, variants=1)
+
+        entities = Model.generate(3, batch_size=3)
+        entities = ndb.get_multi([entity.key for entity in entities], use_cache=False, use_memcache=False)
+        self.assertEqual(len(entities[0].prop), 3)
+        self.assertEqual(entities[0].prop, entities[2].prop)
+
     #
     # Computed Property
     # ----------------------------------------------------------------
@@ -1066,15 +1967,57 @@ class FakeTestCase(BaseTestCase):
     # Blob Property
     # ----------------------------------------------------------------
 
-    def test_blob_property(self):
-        self.assertRaises(NotImplementedError, model.BlobProperty)
+    def test_blob_property_value(self):
+        class Model(model.Model):
+            prop = model.BlobProperty()
+        entity = Model.create()
+
+        self.assertIsInstance(entity.prop, str)
+        self.assertEqual(len(entity.prop), 64)
+
+    def test_blob_property_size(self):
+        class Model(model.Model):
+            prop = model.BlobProperty(size=(1024, 2048), repeated=True, length=6)
+        entity = Model.create()
+
+        for value in entity.prop:
+            self.assertTrue(1024 <= len(value) <= 2048)
+
+    def test_blob_property_compressibility(self):
+        class Model(model.Model):
+            noise = model.BlobProperty(size=4096)
+            zeros = model.BlobProperty(size=4096, compressibility=0.75)
+        entity = Model.create()
+
+        self.assertEqual(len(entity.zeros), 4096)
+        self.assertLess(len(zlib.compress(entity.zeros)), len(zlib.compress(entity.noise)) / 2)
+
+    def test_blob_property_names(self):
+        class Model(model.Model):
+            blob = model.StringProperty()
+            blob_key = model.StringProperty()
+        entity = Model.create()
+
+        self.assertIsInstance(entity.blob, basestring)
+        self.assertIsInstance(entity.blob_key, basestring)
+
+    def test_blob_property_bad_compressibility(self):
+        self.assertRaises(ValueError, model.BlobProperty, compressibility='#badfloat')
+        self.assertRaises(ValueError, model.BlobProperty, compressibility=1.5)
 
     #
     # Blob Key Property
     # ----------------------------------------------------------------
 
-    def test_blob_key_property(self):
-        self.assertRaises(NotImplementedError, model.BlobKeyProperty)
+    def test_blob_key_property_value(self):
+        self.testbed.init_blobstore_stub()
+
+        class Model(model.Model):
+            prop = model.BlobKeyProperty(size=1024)
+        entity = Model.create()
+
+        self.assertIsInstance(entity.prop, blobstore.BlobKey)
+        self.assertEqual(blobstore.BlobInfo.get(entity.prop).size, 1024)
 
     # ----------------------------------------------------------------
 